@@ -10,7 +10,7 @@ class LicenseAdmin(admin.ModelAdmin):
 
 @admin.register(Barbershop)
 class BarbershopAdmin(admin.ModelAdmin):
-    list_display = ('name', 'owner', 'created_at')
+    list_display = ('name', 'owner', 'opening_time', 'closing_time', 'created_at')
     search_fields = ('name', 'owner__username')
 
 @admin.register(Barber)
@@ -0,0 +1,114 @@
+# core/analytics.py
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+
+from .cache import tenant_cache_get_or_set
+from .models import Haircut, HaircutDailyStats
+
+CENTS = Decimal('0.01')
+
+
+def _average(revenue, cuts):
+    return (revenue / cuts).quantize(CENTS) if cuts else Decimal('0.00')
+
+
+def _share(part, total):
+    # Porcentaje con un decimal
+    return round(float(100 * part / total), 1) if total else 0.0
+
+
+def _summary(cuts, revenue, cash, yape):
+    return {
+        'cuts': cuts,
+        'revenue': revenue,
+        'averageTicket': _average(revenue, cuts),
+        'cashTotal': cash,
+        'yapeTotal': yape,
+        'paymentMix': {'CASH': _share(cash, revenue), 'YAPE': _share(yape, revenue)},
+    }
+
+
+def haircut_analytics(barbershop_id, start_date, end_date):
+    """
+    Ranking de barberos, mezcla de métodos de pago y mapas de calor por hora
+    y día de la semana, en dos consultas agrupadas sin importar el rango:
+    los totales salen de los acumulados diarios y las horas, de los cortes.
+    """
+    per_barber = (
+        HaircutDailyStats.objects.filter(barbershop_id=barbershop_id, date__range=[start_date, end_date])
+        .values('barber_id', 'barber__name')
+        .annotate(
+            cuts=Sum('cut_count'),
+            revenue=Sum('total_amount'),
+            cash=Sum('total_amount', filter=Q(payment_method='CASH')),
+            yape=Sum('total_amount', filter=Q(payment_method='YAPE')),
+        )
+        .order_by()
+    )
+    # Hora local (TIME_ZONE) del corte y día de la semana del día de negocio: 1 = lunes
+    per_slot = (
+        Haircut.objects.filter(barbershop_id=barbershop_id, business_date__range=[start_date, end_date])
+        .values('barber_id', weekday=ExtractIsoWeekDay('business_date'), hour=ExtractHour('created_at'))
+        .annotate(cuts=Count('id'), revenue=Sum('amount'))
+        .order_by()
+    )
+
+    barbers = {}
+    totals = {'cuts': 0, 'revenue': Decimal('0'), 'cash': Decimal('0'), 'yape': Decimal('0')}
+    for row in per_barber:
+        values = {
+            'cuts': row['cuts'] or 0,
+            'revenue': row['revenue'] or Decimal('0'),
+            'cash': row['cash'] or Decimal('0'),
+            'yape': row['yape'] or Decimal('0'),
+        }
+        if not values['cuts']:
+            continue
+        for key, value in values.items():
+            totals[key] += value
+        barbers[row['barber_id']] = {
+            'id': row['barber_id'],
+            'name': row['barber__name'],
+            **_summary(values['cuts'], values['revenue'], values['cash'], values['yape']),
+            'hourly': [0] * 24,
+            'weekday': [0] * 7,
+        }
+
+    heatmap = [[0] * 24 for _ in range(7)]
+    hourly_revenue = [Decimal('0')] * 24
+    for row in per_slot:
+        weekday, hour = row['weekday'] - 1, row['hour']
+        heatmap[weekday][hour] += row['cuts']
+        hourly_revenue[hour] += row['revenue']
+        barber = barbers.get(row['barber_id'])
+        if barber is not None:
+            barber['hourly'][hour] += row['cuts']
+            barber['weekday'][weekday] += row['cuts']
+
+    leaderboard = sorted(barbers.values(), key=lambda barber: (-barber['revenue'], -barber['cuts'], barber['name']))
+    for rank, barber in enumerate(leaderboard, 1):
+        barber['rank'] = rank
+
+    return {
+        'startDate': start_date.isoformat(),
+        'endDate': end_date.isoformat(),
+        'totals': _summary(totals['cuts'], totals['revenue'], totals['cash'], totals['yape']),
+        'barbers': leaderboard,
+        'hourly': [sum(day[hour] for day in heatmap) for hour in range(24)],
+        'hourlyRevenue': hourly_revenue,
+        'weekday': [sum(day) for day in heatmap],
+        'heatmap': heatmap,
+    }
+
+
+def cached_haircut_analytics(barbershop_id, start_date, end_date):
+    # Se invalida con cualquier escritura de cortes o barberos (por los nombres)
+    return tenant_cache_get_or_set(
+        barbershop_id,
+        ('analytics', start_date, end_date),
+        lambda: haircut_analytics(barbershop_id, start_date, end_date),
+        settings.ANALYTICS_CACHE_TTL,
+    )
@@ -0,0 +1,130 @@
+# core/async_views.py
+# Versiones async de las lecturas que más consultan los paneles (balance,
+# reporte y listados). Son vistas de Django, no de DRF (DRF 3.14 no tiene
+# vistas async): la autenticación y la licencia ya las resolvió
+# LicenseMiddleware, que no sale del event loop en el camino habitual.
+# Bajo uvicorn (ver gunicorn.conf.py) un solo proceso atiende muchas
+# consultas a la vez mientras esperan a la base de datos.
+from functools import wraps
+
+from django.db.models import Q, Sum
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.shortcuts import render
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.encoders import JSONEncoder
+
+from .cache import atenant_cache_get_or_set
+from .etags import async_tenant_etag
+from .exports import EXPORT_FORMATS, astream_haircuts
+from .models import Haircut, HaircutDailyStats, Reservation
+from .pagination import HaircutCursorPagination, ReservationCursorPagination
+from .serializers import HaircutRowEncoder, ReservationSerializer
+
+
+def _json(data, status=200):
+    # Mismo encoder que DRF, así los montos salen igual que en /api/haircuts/
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def tenant_read_view(view):
+    """Solo GET; pasa a la vista el id de la barbería resuelto por LicenseMiddleware."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET'])
+        barbershop_id = getattr(request, 'barbershop_id', None)
+        if barbershop_id is None:
+            return _json({'error': 'No se encontró una barbería asociada a este usuario'}, status=400)
+        return await view(request, barbershop_id, *args, **kwargs)
+    return wrapper
+
+
+async def _list(request, queryset, pagination_class, encode):
+    # Misma paginación opcional (?cursor / ?page_size) que los listados de DRF
+    paginator = pagination_class()
+    try:
+        page_queryset = paginator.page_queryset(queryset, request)
+    except NotFound as e:
+        return _json({'detail': str(e.detail)}, status=404)
+    if page_queryset is None:
+        return _json(encode([row async for row in queryset]))
+    page = paginator.build_page([row async for row in page_queryset])
+    return _json(paginator.get_paginated_data(encode(page)))
+
+
+@tenant_read_view
+@async_tenant_etag()
+async def haircut_list(request, barbershop_id):
+    rows = Haircut.objects.filter(barbershop_id=barbershop_id).values(*HaircutRowEncoder.columns)
+    return await _list(request, rows, HaircutCursorPagination, HaircutRowEncoder().encode_many)
+
+
+@tenant_read_view
+@async_tenant_etag()
+async def reservation_list(request, barbershop_id):
+    reservations = Reservation.objects.filter(barbershop_id=barbershop_id, is_active=True).order_by('date', 'time')
+    return await _list(
+        request, reservations, ReservationCursorPagination,
+        lambda page: ReservationSerializer(page, many=True).data,
+    )
+
+
+@tenant_read_view
+@async_tenant_etag(extra=lambda request: timezone.localdate())
+async def haircut_balance(request, barbershop_id):
+    today = timezone.localdate()
+    period = request.GET.get('period', 'daily')
+
+    async def compute_totals():
+        stats = HaircutDailyStats.objects.filter(barbershop_id=barbershop_id)
+        if period == 'daily':
+            stats = stats.filter(date=today)
+        else:  # monthly
+            stats = stats.filter(date__gte=today.replace(day=1), date__lte=today)
+
+        totals = await stats.aaggregate(
+            totalIncome=Sum('total_amount'),
+            totalCuts=Sum('cut_count'),
+            cashTotal=Sum('total_amount', filter=Q(payment_method='CASH')),
+            yapeTotal=Sum('total_amount', filter=Q(payment_method='YAPE')),
+        )
+        return {key: value or 0 for key, value in totals.items()}
+
+    # Misma entrada de caché que HaircutViewSet.balance
+    totals = await atenant_cache_get_or_set(barbershop_id, ('balance', period, today), compute_totals)
+    return _json({f'{period}Stats': totals})
+
+
+@tenant_read_view
+async def haircut_report(request, barbershop_id):
+    start_date = parse_date(request.GET.get('startDate') or '')
+    end_date = parse_date(request.GET.get('endDate') or '')
+    if not start_date or not end_date:
+        return _json({'error': 'Se requieren startDate y endDate con formato YYYY-MM-DD'}, status=400)
+
+    haircuts = Haircut.objects.filter(
+        barbershop_id=barbershop_id, business_date__range=[start_date, end_date]
+    ).order_by('created_at')
+
+    # ?format=csv / ?format=ndjson: exportación en streaming
+    export_format = request.GET.get('format')
+    if export_format in EXPORT_FORMATS:
+        return astream_haircuts(haircuts, export_format, f'cortes_{start_date}_{end_date}')
+
+    total = await haircuts.aaggregate(
+        total=Sum('amount'),
+        total_cash=Sum('amount', filter=Q(payment_method='CASH')),
+        total_yape=Sum('amount', filter=Q(payment_method='YAPE'))
+    )
+    # La plantilla no puede consultar la base desde el event loop: se carga antes
+    context = {
+        'haircuts': [haircut async for haircut in haircuts.select_related('barber')],
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'total': total['total'] or 0,
+        'total_cash': total['total_cash'] or 0,
+        'total_yape': total['total_yape'] or 0,
+    }
+    return render(request, 'core/report.html', context)
@@ -0,0 +1,81 @@
+# core/authentication.py
+import hashlib
+
+from django.contrib.auth.models import User
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+
+class VerifiedAccessToken(AccessToken):
+    """AccessToken construido con un payload que LicenseMiddleware ya verificó."""
+
+    def __init__(self, token, payload):
+        self.token = token
+        self.payload = payload
+        self.current_time = aware_utcnow()
+
+
+class LazyTokenUser(SimpleLazyObject):
+    """
+    Usuario autenticado por los claims del token. Solo se consulta en la base
+    de datos si la vista necesita algo más que su id.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id, func=None):
+        super().__init__(func or (lambda: User.objects.get(pk=user_id)))
+        self.__dict__['_user_id'] = user_id
+
+    @property
+    def id(self):
+        return self.__dict__['_user_id']
+
+    pk = id
+
+    def __bool__(self):
+        return True
+
+
+def license_revision(user, barbershop, license):
+    # Huella del estado que autoriza al usuario; si algo cambia, los claims
+    # emitidos con la huella anterior dejan de aceptarse.
+    raw = ':'.join(str(value) for value in (
+        user.pk, user.is_active, barbershop.pk, license.pk,
+        license.is_active, license.expires_at.timestamp(), license.machine_id,
+    ))
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def license_claims(user, barbershop, license):
+    return {
+        'bid': barbershop.pk,
+        'lid': license.pk,
+        'mid': license.machine_id,
+        'exp': int(license.expires_at.timestamp()),
+        'rev': license_revision(user, barbershop, license),
+    }
+
+
+class LicenseJWTAuthentication(JWTAuthentication):
+    """
+    Reutiliza el usuario y el token que LicenseMiddleware dejó en la request,
+    sin volver a comprobar la firma ni consultar el usuario. En las rutas que
+    el middleware no revisa se valida el token como siempre.
+    """
+
+    def authenticate(self, request):
+        user = getattr(request._request, 'jwt_user', None)
+        if user is None:
+            return super().authenticate(request)
+
+        # El estado activo de un LazyTokenUser ya está cubierto por la huella
+        if not isinstance(user, LazyTokenUser) and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        return user, request._request.jwt_token
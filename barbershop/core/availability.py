@@ -0,0 +1,97 @@
+# core/availability.py
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Reservation, ReservationDay
+
+SLOT_MINUTES = 30
+
+
+def _minutes(time):
+    return time.hour * 60 + time.minute
+
+
+def slot_index(time):
+    return _minutes(time) // SLOT_MINUTES
+
+
+def slot_time(index):
+    minutes = index * SLOT_MINUTES
+    return datetime.time(minutes // 60, minutes % 60)
+
+
+def mark_slot(barbershop_id, date, time, booked=True):
+    """Marca (o libera) un turno en el mapa de bits del día."""
+    mask = 1 << slot_index(time)
+    days = ReservationDay.objects.filter(barbershop_id=barbershop_id, date=date)
+    if not booked:
+        days.update(booked=F('booked').bitand(~mask))
+        return
+
+    if days.update(booked=F('booked').bitor(mask)):
+        return
+    try:
+        with transaction.atomic():
+            ReservationDay.objects.create(barbershop_id=barbershop_id, date=date, booked=mask)
+    except IntegrityError:
+        # Otra reserva del mismo día creó la fila al mismo tiempo
+        days.update(booked=F('booked').bitor(mask))
+
+
+def rebuild_reservation_days(barbershop_id=None):
+    """Recalcula los mapas de bits desde las reservas activas."""
+    reservations = Reservation.objects.filter(is_active=True)
+    days = ReservationDay.objects.all()
+    if barbershop_id is not None:
+        reservations = reservations.filter(barbershop_id=barbershop_id)
+        days = days.filter(barbershop_id=barbershop_id)
+
+    bitmaps = {}
+    for shop_id, date, time in reservations.values_list('barbershop_id', 'date', 'time').iterator():
+        key = (shop_id, date)
+        bitmaps[key] = bitmaps.get(key, 0) | (1 << slot_index(time))
+
+    with transaction.atomic():
+        days.delete()
+        ReservationDay.objects.bulk_create(
+            [ReservationDay(barbershop_id=shop_id, date=date, booked=booked)
+             for (shop_id, date), booked in bitmaps.items()],
+            batch_size=1000,
+        )
+    return len(bitmaps)
+
+
+def free_slots(barbershop, start_date, end_date):
+    """
+    Turnos libres por día dentro del horario de la barbería, sin leer la
+    tabla de reservas: una fila de ReservationDay por día con reservas.
+    """
+    booked_by_date = dict(
+        ReservationDay.objects.filter(
+            barbershop_id=barbershop.pk, date__range=[start_date, end_date]
+        ).values_list('date', 'booked')
+    )
+    # Horarios fuera de la grilla de 30 minutos: el primer turno empieza en o
+    # después de la apertura y el último termina en o antes del cierre
+    opening = -(-_minutes(barbershop.opening_time) // SLOT_MINUTES)
+    closing = (_minutes(barbershop.closing_time) - SLOT_MINUTES) // SLOT_MINUTES + 1
+
+    now = timezone.localtime()
+    days = []
+    date = start_date
+    while date <= end_date:
+        booked = booked_by_date.get(date, 0)
+        first = opening
+        if date == now.date():
+            first = max(first, slot_index(now.time()) + 1)
+        slots = [
+            slot_time(index).strftime('%H:%M')
+            for index in range(first, closing)
+            if date >= now.date() and not booked & (1 << index)
+        ]
+        days.append({'date': date.isoformat(), 'free': slots})
+        date += datetime.timedelta(days=1)
+    return days
@@ -0,0 +1,10 @@
+# core/benchmarks.py
+# Utilidades compartidas por los comandos benchmark_db y benchmark_api
+
+
+def percentile(values, percent):
+    """Percentil de una lista de duraciones en segundos, en milisegundos."""
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * percent / 100))] * 1000, 2)
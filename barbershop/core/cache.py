@@ -0,0 +1,185 @@
+# core/cache.py
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+
+from core.models import Barbershop
+
+LICENSE_CACHE_TTL = getattr(settings, 'LICENSE_CACHE_TTL', 60)
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _generation(key):
+    # Invalidar = cambiar la "generación" que forma parte de las claves: las
+    # entradas anteriores quedan huérfanas (y el backend las desaloja) sin
+    # tener que listarlas. Si la generación misma se desaloja, se crea otra
+    # nueva, lo que equivale a invalidar: nunca se sirve un dato viejo.
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+async def _ageneration(key):
+    generation = await cache.aget(key)
+    if generation is None:
+        await cache.aadd(key, time.time_ns(), None)
+        generation = await cache.aget(key)
+    return generation
+
+
+def _generation_key(user_id):
+    return f'license:gen:{user_id}'
+
+
+def _license_generation(user_id):
+    # Una generación por usuario cubre las entradas de todas sus máquinas
+    return _generation(_generation_key(user_id))
+
+
+def _load_license_state(user_id):
+    # Lanza User.DoesNotExist igual que antes para mantener USER_NOT_FOUND
+    user = User.objects.get(id=user_id)
+    barbershop = (
+        Barbershop.objects.select_related('license')
+        .filter(owner=user)
+        .first()
+    )
+    return {'user': user, 'barbershop': barbershop}
+
+
+def get_license_state(user_id, machine_id):
+    """
+    Devuelve el usuario y su barbería (con la licencia ya cargada).
+
+    El resultado se guarda por usuario y machine_id durante LICENSE_CACHE_TTL
+    segundos; en un acierto no se ejecuta ninguna consulta.
+    """
+    key = f'license:state:{user_id}:{_license_generation(user_id)}:{machine_id}'
+    state = cache.get(key)
+    if state is not None:
+        _count('hits')
+        return state
+
+    _count('misses')
+    state = _load_license_state(user_id)
+    cache.set(key, state, LICENSE_CACHE_TTL)
+    return state
+
+
+def get_license_revision(user_id):
+    return cache.get(f'license:rev:{user_id}')
+
+
+async def aget_license_revision(user_id):
+    return await cache.aget(f'license:rev:{user_id}')
+
+
+def set_license_revision(user_id, revision):
+    cache.set(f'license:rev:{user_id}', revision, LICENSE_CACHE_TTL)
+
+
+def invalidate_license_state(user_id):
+    cache.set(_generation_key(user_id), time.time_ns(), None)
+    cache.delete(f'license:rev:{user_id}')
+    _count('invalidations')
+
+
+def _tenant_generation_key(barbershop_id):
+    return f'tenant:gen:{barbershop_id}'
+
+
+def tenant_key(barbershop_id, *parts):
+    """Clave dentro del espacio de la barbería; cambia al invalidarla."""
+    return ':'.join(str(part) for part in ('tenant', barbershop_id, tenant_version(barbershop_id), *parts))
+
+
+def tenant_version(barbershop_id):
+    """
+    Versión de la barbería en la caché: cambia con cada invalidate_cache, que
+    también llaman las operaciones que no escriben en el registro de cambios
+    (recalcular acumulados, datos generados, altas masivas).
+    """
+    return _generation(_tenant_generation_key(barbershop_id))
+
+
+async def atenant_version(barbershop_id):
+    return await _ageneration(_tenant_generation_key(barbershop_id))
+
+
+def tenant_cache_get_or_set(barbershop_id, parts, compute, timeout=None):
+    """
+    Devuelve el valor cacheado para la barbería o lo calcula con compute().
+    Sin timeout se usa el TIMEOUT configurado en CACHES.
+    """
+    key = tenant_key(barbershop_id, *parts)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        if timeout is None:
+            cache.set(key, value)
+        else:
+            cache.set(key, value, timeout)
+    return value
+
+
+async def atenant_cache_get_or_set(barbershop_id, parts, compute, timeout=None):
+    # Igual que tenant_cache_get_or_set para vistas async; compute es una corrutina
+    generation = await atenant_version(barbershop_id)
+    key = ':'.join(str(part) for part in ('tenant', barbershop_id, generation, *parts))
+    value = await cache.aget(key)
+    if value is None:
+        value = await compute()
+        if timeout is None:
+            await cache.aset(key, value)
+        else:
+            await cache.aset(key, value, timeout)
+    return value
+
+
+def invalidate_tenant_cache(barbershop_id):
+    cache.set(_tenant_generation_key(barbershop_id), time.time_ns(), None)
+
+
+def invalidate_cache(barbershop_id=None, user_id=None):
+    """
+    Punto único de invalidación: descarta lo cacheado de la barbería y/o el
+    estado de licencia del usuario. Lo llaman las señales de los modelos y
+    las operaciones masivas que no las disparan.
+    """
+    if barbershop_id is not None:
+        invalidate_tenant_cache(barbershop_id)
+    if user_id is not None:
+        invalidate_license_state(user_id)
+
+
+def invalidate_cache_on_commit(barbershop_id=None, user_id=None):
+    """
+    invalidate_cache cuando la transacción actual confirme (o ya, fuera de
+    una). Si se invalidara antes, una lectura concurrente volvería a cachear
+    bajo la nueva generación datos calculados sin estas escrituras.
+    """
+    transaction.on_commit(lambda: invalidate_cache(barbershop_id=barbershop_id, user_id=user_id))
+
+
+def license_cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else None
+    stats['pid'] = os.getpid()
+    stats['ttl'] = LICENSE_CACHE_TTL
+    return stats
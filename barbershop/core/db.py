@@ -0,0 +1,13 @@
+# core/db.py
+from django.conf import settings
+
+
+def sqlite_pragmas(connection):
+    # Una base puede traer los suyos en DATABASES[alias]['PRAGMAS'] (p. ej. benchmark_db)
+    return connection.settings_dict.get('PRAGMAS', settings.SQLITE_PRAGMAS)
+
+
+def apply_sqlite_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        # Nombres y valores vienen de la configuración, no de la request
+        cursor.execute(f'PRAGMA {name} = {value}')
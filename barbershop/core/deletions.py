@@ -0,0 +1,157 @@
+# core/deletions.py
+import gzip
+import logging
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS
+from .models import Haircut, HaircutDeletionJob
+from .stats import subtract_haircut_stats
+from .sync import log_changes
+from .tasks import run_in_background
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('pending', 'archiving', 'deleting')
+
+
+def start_deletion_job(barbershop_id, archive=False):
+    """
+    Crea el trabajo que elimina los cortes actuales de la barbería, o devuelve
+    el que ya está en curso. Devuelve (job, creado); job es None si no hay cortes.
+    """
+    job = HaircutDeletionJob.objects.filter(
+        barbershop_id=barbershop_id, status__in=ACTIVE_STATUSES
+    ).first()
+    if job:
+        return job, False
+
+    current = Haircut.objects.filter(barbershop_id=barbershop_id).aggregate(
+        total=Count('id'), max_id=Max('id')
+    )
+    if not current['total']:
+        return None, False
+    job = HaircutDeletionJob.objects.create(
+        barbershop_id=barbershop_id, archive=archive, **current
+    )
+    return job, True
+
+
+def _job_haircuts(job):
+    return Haircut.objects.filter(barbershop_id=job.barbershop_id, id__lte=job.max_id)
+
+
+def _set_status(job, status):
+    job.status = status
+    job.save(update_fields=['status', 'updated_at'])
+
+
+def _archive(job):
+    # CSV comprimido con el mismo formato que la exportación; se escribe en
+    # un temporal, así un reintento simplemente vuelve a empezar el archivo
+    path = Path(settings.ARCHIVES_ROOT) / str(job.barbershop_id) / f'cortes_{job.id}.csv.gz'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+
+    _, lines = EXPORT_FORMATS['csv']
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', newline='') as archive:
+        for count, line in enumerate(lines(_job_haircuts(job)), 1):
+            archive.write(line)
+            if count % EXPORT_CHUNK_SIZE == 0:
+                # Señal de vida para que no se considere abandonado
+                HaircutDeletionJob.objects.filter(pk=job.pk).update(updated_at=timezone.now())
+    os.replace(tmp_path, path)
+
+    job.archive_path = str(path)
+    job.save(update_fields=['archive_path', 'updated_at'])
+
+
+def _delete_range(barbershop_id, first_id, last_id):
+    table = connection.ops.quote_name(Haircut._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE barbershop_id = %s AND id BETWEEN %s AND %s',
+            [barbershop_id, first_id, last_id],
+        )
+        return cursor.rowcount
+
+
+def _delete_batch(job):
+    # Cada lote es una transacción corta: el lock de escritura se libera entre
+    # lotes y, si el proceso muere, el avance guardado coincide con lo borrado
+    with transaction.atomic():
+        ids = list(
+            _job_haircuts(job).order_by('id').values_list('id', flat=True)
+            [:settings.HAIRCUT_DELETE_BATCH_SIZE]
+        )
+        if not ids:
+            return False
+
+        # El lote son los primeros ids del trabajo: el rango lo describe exactamente
+        batch = _job_haircuts(job).filter(id__range=(ids[0], ids[-1]))
+        # Sin QuerySet.delete() a propósito: con receptores de post_delete
+        # Django cargaría cada fila y enviaría una señal por corte. Lo que
+        # hacen esas señales (acumulados, registro de cambios y caché) se
+        # hace aquí una vez por lote, con un DELETE directo.
+        subtract_haircut_stats(batch)
+        deleted = _delete_range(job.barbershop_id, ids[0], ids[-1])
+        log_changes(job.barbershop_id, 'haircut', ids, 'delete')
+
+        job.deleted += deleted
+        job.save(update_fields=['deleted', 'updated_at'])
+    return True
+
+
+def run_deletion_job(job_id):
+    """Ejecuta (o continúa) el trabajo desde la fase en la que quedó."""
+    job = HaircutDeletionJob.objects.get(pk=job_id)
+    try:
+        if job.status == 'pending':
+            _set_status(job, 'archiving' if job.archive else 'deleting')
+        if job.status == 'archiving':
+            _archive(job)
+            _set_status(job, 'deleting')
+        if job.status == 'deleting':
+            while _delete_batch(job):
+                pass
+            job.status = 'done'
+            job.finished_at = timezone.now()
+            job.save(update_fields=['status', 'finished_at', 'updated_at'])
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+        raise
+    return job
+
+
+def schedule_deletion_job(job_id):
+    run_in_background(run_deletion_job, job_id)
+
+
+def claim_stale_job(job):
+    """
+    Toma un trabajo sin avance reciente (su worker se reinició). La
+    actualización condicional asegura que solo un proceso lo retome.
+    """
+    if job.status not in ACTIVE_STATUSES:
+        return False
+    if job.updated_at > timezone.now() - timedelta(seconds=settings.DELETION_JOB_STALE_SECONDS):
+        return False
+    return bool(
+        HaircutDeletionJob.objects.filter(pk=job.pk, updated_at=job.updated_at)
+        .update(updated_at=timezone.now())
+    )
+
+
+def stale_deletion_jobs():
+    for job in HaircutDeletionJob.objects.filter(status__in=ACTIVE_STATUSES).order_by('id'):
+        if claim_stale_job(job):
+            yield job
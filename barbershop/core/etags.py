@@ -0,0 +1,86 @@
+# core/etags.py
+import hashlib
+from functools import wraps
+
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import atenant_version, tenant_version
+from .sync import acurrent_cursor, current_cursor
+from .tenancy import get_request_barbershop_id
+
+
+def _etag(parts):
+    return '"%s"' % hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+
+def tenant_etag(extra=None):
+    """
+    ETag fuerte basado en la versión de datos de la barbería: el último
+    cursor del registro de cambios, que avanza con cualquier escritura de
+    barberos, cortes o reservas, y la versión de su caché (tenant_version),
+    que cambia también con lo que no pasa por el registro, como recalcular
+    los acumulados. Calcularlo solo lee el índice de ChangeLog y la caché,
+    así que un 304 no toca las tablas principales ni serializa nada.
+
+    `extra(request)` agrega lo que no depende de escrituras (p. ej. la fecha
+    de hoy en el balance diario).
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            barbershop_id = get_request_barbershop_id(request)
+            parts = [
+                barbershop_id,
+                current_cursor(barbershop_id),
+                tenant_version(barbershop_id),
+                request.get_full_path(),
+                request.accepted_media_type,
+            ]
+            if extra is not None:
+                parts.append(extra(request))
+            etag = _etag(parts)
+
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
+
+
+def async_tenant_etag(extra=None):
+    """
+    tenant_etag para las vistas async de core/async_views.py, que reciben el
+    id de la barbería como segundo argumento.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, barbershop_id, *args, **kwargs):
+            parts = [
+                barbershop_id,
+                await acurrent_cursor(barbershop_id),
+                await atenant_version(barbershop_id),
+                request.get_full_path(),
+                request.headers.get('Accept', ''),
+            ]
+            if extra is not None:
+                parts.append(extra(request))
+            etag = _etag(parts)
+
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                return response
+
+            response = await view(request, barbershop_id, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
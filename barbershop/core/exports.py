@@ -0,0 +1,136 @@
+# core/exports.py
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FIELDS = ('id', 'created_at', 'client_name', 'barber__name', 'payment_method', 'amount')
+EXPORT_HEADER = ('id', 'fecha', 'cliente', 'barbero', 'metodo_pago', 'monto')
+
+
+class _Echo:
+    # csv.writer escribe en este objeto y devuelve la línea en vez de guardarla
+    def write(self, value):
+        return value
+
+
+def _export_queryset(queryset, named=False):
+    # Una sola consulta (con el JOIN al barbero) leída por bloques
+    return queryset.order_by('created_at', 'id').values_list(*EXPORT_FIELDS, named=named)
+
+
+def _export_row(row):
+    haircut_id, created_at, client_name, barber_name, payment_method, amount = row
+    return (
+        haircut_id,
+        timezone.localtime(created_at).isoformat(),
+        client_name or '',
+        barber_name,
+        payment_method,
+        str(amount),
+    )
+
+
+def _export_rows(queryset):
+    for row in _export_queryset(queryset).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield _export_row(row)
+
+
+async def _aexport_rows(queryset):
+    # aiterator() lee cada bloque con sync_to_async. Con named=True porque en
+    # Django 4.2 el iterador de values_list() simple ejecuta la consulta al
+    # crearse, en el event loop, y falla con SynchronousOnlyOperation
+    rows = _export_queryset(queryset, named=True)
+    async for row in rows.aiterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield _export_row(row)
+
+
+def _in_chunks(lines):
+    # Agrupa líneas para no enviar un fragmento HTTP por cada fila. La primera
+    # se envía sola para que el cliente reciba datos antes de que termine la consulta.
+    chunk = []
+    first = True
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= EXPORT_CHUNK_SIZE or first:
+            yield ''.join(chunk)
+            chunk = []
+            first = False
+    if chunk:
+        yield ''.join(chunk)
+
+
+async def _ain_chunks(lines):
+    chunk = []
+    first = True
+    async for line in lines:
+        chunk.append(line)
+        if len(chunk) >= EXPORT_CHUNK_SIZE or first:
+            yield ''.join(chunk)
+            chunk = []
+            first = False
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _ndjson_line(row):
+    return json.dumps(dict(zip(EXPORT_HEADER, row)), ensure_ascii=False) + '\n'
+
+
+def _csv_lines(queryset):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    for row in _export_rows(queryset):
+        yield writer.writerow(row)
+
+
+def _ndjson_lines(queryset):
+    for row in _export_rows(queryset):
+        yield _ndjson_line(row)
+
+
+async def _acsv_lines(queryset):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    async for row in _aexport_rows(queryset):
+        yield writer.writerow(row)
+
+
+async def _andjson_lines(queryset):
+    async for row in _aexport_rows(queryset):
+        yield _ndjson_line(row)
+
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', _csv_lines),
+    'ndjson': ('application/x-ndjson; charset=utf-8', _ndjson_lines),
+}
+
+
+ASYNC_EXPORT_LINES = {
+    'csv': _acsv_lines,
+    'ndjson': _andjson_lines,
+}
+
+
+def stream_haircuts(queryset, export_format, filename):
+    """
+    Exporta los cortes sin cargarlos en memoria: la consulta se ejecuta
+    cuando el cliente empieza a leer y la memoria no crece con el rango.
+    """
+    content_type, lines = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(_in_chunks(lines(queryset)), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+
+def astream_haircuts(queryset, export_format, filename):
+    # Igual que stream_haircuts, leyendo con el ORM async (vistas ASGI)
+    content_type, _ = EXPORT_FORMATS[export_format]
+    lines = ASYNC_EXPORT_LINES[export_format](queryset)
+    response = StreamingHttpResponse(_ain_chunks(lines), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
@@ -0,0 +1,254 @@
+import datetime
+import itertools
+import json
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.utils import timezone
+
+from core.benchmarks import percentile
+from core.models import Barbershop, Haircut, Reservation
+
+# Nombre de las reservas que crea el benchmark; se borran al terminar
+BENCHMARK_CLIENT = 'benchmark_api'
+# Las reservas nuevas van más allá del calendario generado para no chocar
+FIRST_WRITE_DAY = 400
+SLOTS_PER_DAY = 24
+
+
+class InProcessTransport:
+    # Client de Django: pasa por todos los middlewares (métricas, licencia,
+    # perfilado) sin servidor ni red de por medio
+    def __init__(self):
+        self.client = Client()
+
+    def request(self, method, path, headers, body=None):
+        if body is None:
+            response = self.client.generic(method, path, headers=headers)
+        else:
+            response = self.client.generic(method, path, json.dumps(body), 'application/json', headers=headers)
+        # Consumir el streaming para medir la respuesta completa
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, content
+
+
+class HttpTransport:
+    # Servidor real (gunicorn, runserver, ...) en --url
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, headers, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=data, method=method,
+            headers={**headers, 'Content-Type': 'application/json'},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+class Tenant:
+    def __init__(self, prefix, number, password):
+        self.username = f'{prefix}_owner_{number}'
+        self.password = password
+        self.machine_id = f'{prefix}-machine-{number}'
+        self.access = None
+
+    def headers(self, auth=True):
+        headers = {'X-Machine-ID': self.machine_id}
+        if auth and self.access:
+            headers['Authorization'] = f'Bearer {self.access}'
+        return headers
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide la API con los datos de generate_synthetic_data: login, balance, reporte, '
+        'listados y alta de reservas. Guarda throughput y p50/p95/p99 por escenario en JSON '
+        'para comparar entre commits.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Clientes concurrentes')
+        parser.add_argument('--seconds', type=float, default=10, help='Duración de cada escenario')
+        parser.add_argument('--tenants', type=int, default=0,
+                            help='Barberías a repartir entre los hilos (por defecto una por hilo)')
+        parser.add_argument('--prefix', default='bench', help='Prefijo usado en generate_synthetic_data')
+        parser.add_argument('--password', default='benchmark', help='Clave de los usuarios generados')
+        parser.add_argument('--scenarios', help='Escenarios a correr, separados por comas')
+        parser.add_argument('--no-writes', action='store_true', help='No correr el alta de reservas')
+        parser.add_argument('--url', help='Medir un servidor en marcha en lugar de la API en proceso')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', default='benchmark_api.json', help='Archivo JSON de resultados')
+
+    def handle(self, *args, **options):
+        scenarios = self._scenarios(options)
+        tenant_count = options['tenants'] or options['threads']
+        tenants = [Tenant(options['prefix'], number, options['password']) for number in range(1, tenant_count + 1)]
+        make_transport = (lambda: HttpTransport(options['url'])) if options['url'] else InProcessTransport
+
+        # Un token por barbería antes de empezar; login también se mide aparte
+        transport = make_transport()
+        for tenant in tenants:
+            status, content = transport.request(
+                'POST', '/api/auth/login/', tenant.headers(auth=False),
+                {'username': tenant.username, 'password': tenant.password},
+            )
+            if status != 200:
+                raise CommandError(
+                    f'No se pudo iniciar sesión como {tenant.username} ({status}); '
+                    f'¿se corrió generate_synthetic_data --prefix {options["prefix"]}?'
+                )
+            tenant.access = json.loads(content)['access']
+
+        self.write_counter = itertools.count()
+        self.write_base = FIRST_WRITE_DAY + random.Random(options['seed']).randrange(1000)
+        results = {}
+        try:
+            for name, build in scenarios:
+                results[name] = self._run(name, build, tenants, make_transport, options)
+                result = results[name]
+                self.stdout.write(
+                    f"{name:>18}: {result['requests_per_second']:>8} req/s  "
+                    f"p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  "
+                    f"errores {result['errors']}"
+                )
+        finally:
+            if not options['url']:
+                Reservation.objects.filter(client_name=BENCHMARK_CLIENT).delete()
+
+        report = {'meta': self._meta(options, tenant_count), 'scenarios': results}
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
+
+    def _scenarios(self, options):
+        today = timezone.localdate()
+        report = (
+            f'/api/haircuts/report/?startDate={today - datetime.timedelta(days=30)}&endDate={today}'
+        )
+
+        def get(path):
+            return lambda tenant: ('GET', path, tenant.headers(), None)
+
+        def login(tenant):
+            return 'POST', '/api/auth/login/', tenant.headers(auth=False), {
+                'username': tenant.username, 'password': tenant.password,
+            }
+
+        def create_reservation(tenant):
+            # Cada alta toma un turno distinto: se mide la escritura, no el conflicto
+            number = next(self.write_counter)
+            date = today + datetime.timedelta(days=self.write_base + number // SLOTS_PER_DAY)
+            slot = 18 + number % SLOTS_PER_DAY
+            return 'POST', '/api/reservations/', tenant.headers(), {
+                'client_name': BENCHMARK_CLIENT,
+                'date': date.isoformat(),
+                'time': f'{slot // 2:02d}:{30 * (slot % 2):02d}',
+            }
+
+        scenarios = [
+            ('login', login),
+            ('balance_daily', get('/api/haircuts/balance/?period=daily')),
+            ('balance_monthly', get('/api/haircuts/balance/?period=monthly')),
+            ('report', get(report)),
+            ('haircut_list', get('/api/haircuts/?page_size=100')),
+            ('reservation_list', get('/api/reservations/?page_size=100')),
+            ('reservation_create', create_reservation),
+        ]
+        if options['no_writes']:
+            scenarios = [scenario for scenario in scenarios if scenario[0] != 'reservation_create']
+        if options['scenarios']:
+            selected = [name.strip() for name in options['scenarios'].split(',')]
+            unknown = set(selected) - {name for name, _ in scenarios}
+            if unknown:
+                raise CommandError(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+            scenarios = [scenario for scenario in scenarios if scenario[0] in selected]
+        return scenarios
+
+    def _run(self, name, build, tenants, make_transport, options):
+        lock = threading.Lock()
+        latencies, statuses, sizes = [], {}, []
+        stop_at = time.monotonic() + options['seconds']
+
+        def worker(number):
+            transport = make_transport()
+            tenant = tenants[number % len(tenants)]
+            own_latencies, own_statuses, own_size = [], {}, 0
+            try:
+                while time.monotonic() < stop_at:
+                    method, path, headers, body = build(tenant)
+                    started = time.perf_counter()
+                    status, content = transport.request(method, path, headers, body)
+                    own_latencies.append(time.perf_counter() - started)
+                    own_statuses[status] = own_statuses.get(status, 0) + 1
+                    own_size += len(content)
+            finally:
+                connections.close_all()
+                with lock:
+                    latencies.extend(own_latencies)
+                    sizes.append(own_size)
+                    for status, count in own_statuses.items():
+                        statuses[status] = statuses.get(status, 0) + count
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        return {
+            'requests': len(latencies),
+            'seconds': round(elapsed, 2),
+            'requests_per_second': round(len(latencies) / elapsed, 1),
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'max_ms': round(max(latencies) * 1000, 2) if latencies else None,
+            'mean_bytes': round(sum(sizes) / len(latencies)) if latencies else None,
+            'errors': sum(count for status, count in statuses.items() if status >= 400),
+            'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        }
+
+    def _meta(self, options, tenant_count):
+        meta = {
+            'commit': _git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'target': options['url'] or 'in-process',
+            'threads': options['threads'],
+            'tenants': tenant_count,
+            'seconds_per_scenario': options['seconds'],
+            'debug': settings.DEBUG,
+            'cache_backend': settings.CACHES['default']['BACKEND'],
+            'db_vendor': connection.vendor,
+        }
+        if not options['url']:
+            meta['rows'] = {
+                'barbershops': Barbershop.objects.count(),
+                'haircuts': Haircut.objects.count(),
+                'reservations': Reservation.objects.filter(is_active=True).count(),
+            }
+        return meta
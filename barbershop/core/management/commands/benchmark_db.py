@@ -0,0 +1,155 @@
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections, transaction
+
+from core.benchmarks import percentile
+
+ALIAS = 'benchmark'
+
+# Configuración de Django sin ajustes: PRAGMAs por defecto de SQLite y una
+# conexión nueva por request (CONN_MAX_AGE = 0)
+BASELINE_SQLITE_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'mmap_size': 0}
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide escrituras y lecturas concurrentes con la configuración por defecto '
+        '("antes") y con la configurada en settings ("después")'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4, help='Hilos que escriben')
+        parser.add_argument('--readers', type=int, default=8, help='Hilos que leen')
+        parser.add_argument('--seconds', type=float, default=5, help='Duración de cada corrida')
+        parser.add_argument('--json', dest='json_path', help='Guardar los resultados en este archivo')
+
+    def handle(self, *args, **options):
+        default = connections.settings['default']
+        results = []
+        for label, baseline in (('antes', True), ('después', False)):
+            # En SQLite cada corrida usa un archivo nuevo: journal_mode queda
+            # guardado en el archivo y no se debe tocar la base real
+            path = None
+            settings_dict = dict(default)
+            if default['ENGINE'].endswith('sqlite3'):
+                fd, path = tempfile.mkstemp(suffix='.sqlite3')
+                os.close(fd)
+                settings_dict['NAME'] = path
+                if baseline:
+                    settings_dict['PRAGMAS'] = BASELINE_SQLITE_PRAGMAS
+            connections.settings[ALIAS] = settings_dict
+            try:
+                result = self._run(baseline, options)
+            finally:
+                connections[ALIAS].close()
+                del connections[ALIAS]
+                del connections.settings[ALIAS]
+                if path:
+                    for suffix in ('', '-wal', '-shm', '-journal'):
+                        if os.path.exists(path + suffix):
+                            os.remove(path + suffix)
+            result['config'] = label
+            results.append(result)
+            self.stdout.write(
+                f"{label:>8}: {result['writes_per_second']:>8} escrituras/s  "
+                f"{result['reads_per_second']:>8} lecturas/s  "
+                f"p95 escritura {result['write_p95_ms']} ms  "
+                f"p95 lectura {result['read_p95_ms']} ms  "
+                f"errores {result['errors']}"
+            )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['json_path']}"))
+
+    def _run(self, baseline, options):
+        connection = connections[ALIAS]
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS benchmark_rows')
+            cursor.execute('DROP TABLE IF EXISTS benchmark_totals')
+            cursor.execute('CREATE TABLE benchmark_rows (shop integer, amount numeric(10, 2), created_at varchar(40))')
+            cursor.execute('CREATE INDEX benchmark_rows_shop ON benchmark_rows (shop)')
+            cursor.execute('CREATE TABLE benchmark_totals (shop integer primary key, cuts integer, amount numeric(12, 2))')
+            for shop in range(10):
+                cursor.execute('INSERT INTO benchmark_totals VALUES (%s, 0, 0)', [shop])
+
+        lock = threading.Lock()
+        latencies = {'write': [], 'read': []}
+        errors = []
+        stop_at = time.monotonic() + options['seconds']
+
+        def write(cursor, shop):
+            # Igual que un alta de corte: la fila y su acumulado, en una transacción
+            with transaction.atomic(using=ALIAS):
+                cursor.execute(
+                    'INSERT INTO benchmark_rows VALUES (%s, %s, %s)', [shop, 25, time.time()]
+                )
+                cursor.execute(
+                    'UPDATE benchmark_totals SET cuts = cuts + 1, amount = amount + 25 WHERE shop = %s', [shop]
+                )
+
+        def read(cursor, shop):
+            cursor.execute('SELECT COUNT(*), SUM(amount) FROM benchmark_rows WHERE shop = %s', [shop])
+            cursor.fetchone()
+
+        def worker(kind, operation, number):
+            own = connections[ALIAS]
+            own_latencies = []
+            try:
+                while time.monotonic() < stop_at:
+                    started = time.perf_counter()
+                    try:
+                        with own.cursor() as cursor:
+                            operation(cursor, number % 10)
+                        own_latencies.append(time.perf_counter() - started)
+                    except DatabaseError as e:
+                        with lock:
+                            errors.append(str(e))
+                    if baseline:
+                        # Sin conexiones persistentes: una conexión por operación
+                        own.close()
+            finally:
+                own.close()
+                with lock:
+                    latencies[kind].extend(own_latencies)
+
+        threads = [
+            threading.Thread(target=worker, args=('write', write, i)) for i in range(options['writers'])
+        ] + [
+            threading.Thread(target=worker, args=('read', read, i)) for i in range(options['readers'])
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE benchmark_rows')
+            cursor.execute('DROP TABLE benchmark_totals')
+
+        return {
+            'vendor': connection.vendor,
+            'writers': options['writers'],
+            'readers': options['readers'],
+            'seconds': round(elapsed, 2),
+            'writes': len(latencies['write']),
+            'reads': len(latencies['read']),
+            'writes_per_second': round(len(latencies['write']) / elapsed, 1),
+            'reads_per_second': round(len(latencies['read']) / elapsed, 1),
+            'write_p50_ms': percentile(latencies['write'], 50),
+            'write_p95_ms': percentile(latencies['write'], 95),
+            'read_p50_ms': percentile(latencies['read'], 50),
+            'read_p95_ms': percentile(latencies['read'], 95),
+            'write_mean_ms': round(statistics.mean(latencies['write']) * 1000, 2) if latencies['write'] else None,
+            'errors': len(errors),
+            'sample_errors': sorted(set(errors))[:5],
+        }
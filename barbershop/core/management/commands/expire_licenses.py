@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.cache import invalidate_cache
+from core.models import Barbershop, License
+
+
+class Command(BaseCommand):
+    help = (
+        'Desactiva las licencias vencidas con un UPDATE por lote e invalida el estado '
+        'de licencia cacheado de sus dueños. Pensado para cron, p. ej. cada 15 minutos: '
+        '*/15 * * * * python manage.py expire_licenses'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Licencias por UPDATE')
+        parser.add_argument('--dry-run', action='store_true', help='Solo contar las licencias vencidas')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = License.objects.expired().count()
+            self.stdout.write(f'Licencias vencidas por desactivar: {count}')
+            return
+
+        total = 0
+        while True:
+            # Transacciones cortas: el lock de escritura se libera entre lotes
+            with transaction.atomic():
+                ids = list(
+                    License.objects.expired().order_by('id').values_list('id', flat=True)
+                    [:options['batch_size']]
+                )
+                if not ids:
+                    break
+                # update() no dispara señales: la caché se invalida abajo
+                total += License.objects.filter(id__in=ids, is_active=True).update(is_active=False)
+                owners = list(Barbershop.objects.filter(license_id__in=ids).values_list('id', 'owner_id'))
+
+            for barbershop_id, owner_id in owners:
+                invalidate_cache(barbershop_id=barbershop_id, user_id=owner_id)
+
+        self.stdout.write(self.style.SUCCESS(f'Se desactivaron {total} licencias vencidas'))
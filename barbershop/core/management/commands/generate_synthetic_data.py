@@ -0,0 +1,177 @@
+import datetime
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.availability import rebuild_reservation_days
+from core.cache import invalidate_cache
+from core.models import Barber, Barbershop, Haircut, License, Reservation, business_date_for
+from core.stats import rebuild_haircut_stats
+
+CHUNK_SIZE = 20000
+AMOUNTS = [Decimal(value) for value in ('15.00', '20.00', '25.00', '30.00', '35.00', '40.00', '50.00')]
+FIRST_NAMES = ['Carlos', 'Luis', 'Jorge', 'Miguel', 'José', 'Pedro', 'Juan', 'Diego', 'Andrés', 'Raúl']
+LAST_NAMES = ['Quispe', 'Flores', 'Rojas', 'Huamán', 'Torres', 'Díaz', 'Vargas', 'Castillo', 'Ramos', 'Chávez']
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera datos sintéticos para pruebas de carga: licencias, barberías, barberos, '
+        'años de cortes y calendarios de reservas. Los usuarios son <prefijo>_owner_<n> '
+        'con la clave indicada y la máquina <prefijo>-machine-<n> (ver benchmark_api).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shops', type=int, default=5, help='Barberías (una licencia y un dueño por cada una)')
+        parser.add_argument('--barbers', type=int, default=4, help='Barberos por barbería')
+        parser.add_argument('--years', type=float, default=2, help='Años de historial de cortes')
+        parser.add_argument('--cuts-per-day', type=int, default=40, help='Cortes promedio por día y barbería')
+        parser.add_argument('--reservation-days', type=int, default=60, help='Días futuros con reservas')
+        parser.add_argument('--reservation-fill', type=float, default=0.7,
+                            help='Fracción de turnos reservados (0-1)')
+        parser.add_argument('--prefix', default='bench', help='Prefijo de usuarios y máquinas')
+        parser.add_argument('--password', default='benchmark', help='Clave de los usuarios generados')
+        parser.add_argument('--seed', type=int, default=1, help='Semilla para repetir los mismos datos')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_owner_').exists():
+            raise CommandError(f'Ya existen datos con el prefijo "{prefix}"; use otro con --prefix')
+
+        self.random = random.Random(options['seed'])
+        self.options = options
+        shops = self._create_tenants()
+
+        total_cuts = total_reservations = 0
+        for number, barbershop in enumerate(shops, 1):
+            barbers = self._create_barbers(barbershop)
+            cuts = self._create_haircuts(barbershop, barbers)
+            reservations = self._create_reservations(barbershop)
+            total_cuts += cuts
+            total_reservations += reservations
+            self.stdout.write(f'  [{number}/{len(shops)}] {barbershop.name}: {cuts} cortes, {reservations} reservas')
+
+        # bulk_create no dispara señales: acumulados y mapas de bits se
+        # recalculan por barbería y la caché se invalida. No se escribe el
+        # registro de cambios: un cliente nuevo empieza por el snapshot.
+        for barbershop in shops:
+            rebuild_haircut_stats(barbershop.id)
+            rebuild_reservation_days(barbershop.id)
+            invalidate_cache(barbershop_id=barbershop.id, user_id=barbershop.owner_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Se generaron {len(shops)} barberías, {total_cuts} cortes y {total_reservations} reservas'
+        ))
+
+    def _create_tenants(self):
+        prefix = self.options['prefix']
+        count = self.options['shops']
+        now = timezone.now()
+        # Un solo hash para todos: hashear miles de claves tardaría minutos
+        password = make_password(self.options['password'])
+
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=f'{prefix}_owner_{i}', password=password) for i in range(1, count + 1)
+            ])
+            licenses = License.objects.bulk_create([
+                License(
+                    machine_id=f'{prefix}-machine-{i}',
+                    activated_at=now,
+                    expires_at=now + datetime.timedelta(days=365),
+                )
+                for i in range(1, count + 1)
+            ])
+            return Barbershop.objects.bulk_create([
+                Barbershop(name=f'Barbería {prefix} {i}', owner=user, license=license)
+                for i, (user, license) in enumerate(zip(users, licenses), 1)
+            ])
+
+    def _create_barbers(self, barbershop):
+        return Barber.objects.bulk_create([
+            Barber(
+                barbershop=barbershop,
+                name=f'{self.random.choice(FIRST_NAMES)} {self.random.choice(LAST_NAMES)}',
+            )
+            for _ in range(self.options['barbers'])
+        ])
+
+    def _haircut_times(self, day, barbershop):
+        # Más clientes por la tarde y los fines de semana
+        opening, closing = barbershop.opening_time.hour, barbershop.closing_time.hour
+        weekend = 1.4 if day.weekday() >= 4 else 1.0
+        count = max(0, int(self.random.gauss(self.options['cuts_per_day'] * weekend, 5)))
+        hours = list(range(opening, closing))
+        weights = [1 + (hour >= 16) for hour in hours]
+        tz = timezone.get_default_timezone()
+        for _ in range(count):
+            hour = self.random.choices(hours, weights)[0]
+            moment = datetime.datetime.combine(day, datetime.time(hour, self.random.randrange(60), self.random.randrange(60)))
+            yield timezone.make_aware(moment, tz)
+
+    def _create_haircuts(self, barbershop, barbers):
+        today = timezone.localdate()
+        day = today - datetime.timedelta(days=int(self.options['years'] * 365))
+        created, batch = 0, []
+        while day <= today:
+            for created_at in self._haircut_times(day, barbershop):
+                batch.append(Haircut(
+                    barbershop=barbershop,
+                    barber=self.random.choice(barbers),
+                    client_name=self.random.choice([None, self.random.choice(FIRST_NAMES)]),
+                    payment_method='CASH' if self.random.random() < 0.65 else 'YAPE',
+                    amount=self.random.choice(AMOUNTS),
+                    created_at=created_at,
+                    business_date=business_date_for(created_at),
+                ))
+            if len(batch) >= CHUNK_SIZE:
+                created += self._insert_haircuts(batch)
+                batch = []
+            day += datetime.timedelta(days=1)
+        return created + self._insert_haircuts(batch)
+
+    def _create_reservations(self, barbershop):
+        opening = barbershop.opening_time.hour * 2
+        closing = barbershop.closing_time.hour * 2
+        today = timezone.localdate()
+        batch = []
+        for offset in range(1, self.options['reservation_days'] + 1):
+            date = today + datetime.timedelta(days=offset)
+            for slot in range(opening, closing):
+                if self.random.random() < self.options['reservation_fill']:
+                    batch.append(Reservation(
+                        barbershop=barbershop,
+                        client_name=f'{self.random.choice(FIRST_NAMES)} {self.random.choice(LAST_NAMES)}',
+                        date=date,
+                        time=datetime.time(slot // 2, 30 * (slot % 2)),
+                    ))
+        return self._flush(Reservation, batch)
+
+    def _insert_haircuts(self, rows):
+        # INSERT directo con los valores de cada fila: bulk_create aplicaría
+        # auto_now_add y pondría "ahora" en created_at. Los acumulados, mapas
+        # de bits y caché se recalculan al final (ver handle)
+        fields = [field for field in Haircut._meta.concrete_fields if not field.primary_key]
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(Haircut._meta.db_table),
+            ', '.join(quote(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)),
+        )
+        params = [
+            [field.get_db_prep_save(getattr(row, field.attname), connection) for field in fields]
+            for row in rows
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+        return len(rows)
+
+    def _flush(self, model, rows):
+        with transaction.atomic():
+            model.objects.bulk_create(rows, batch_size=2000)
+        return len(rows)
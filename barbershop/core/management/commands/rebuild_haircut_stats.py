@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.stats import rebuild_haircut_stats
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los acumulados diarios de cortes (HaircutDailyStats)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--barbershop', type=int, help='Solo recalcular esta barbería')
+
+    def handle(self, *args, **options):
+        rows = rebuild_haircut_stats(options['barbershop'])
+        self.stdout.write(self.style.SUCCESS(f'Se generaron {rows} filas de acumulados'))
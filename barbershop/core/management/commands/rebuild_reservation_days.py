@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.availability import rebuild_reservation_days
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los mapas de bits de turnos reservados (ReservationDay)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--barbershop', type=int, help='Solo recalcular esta barbería')
+
+    def handle(self, *args, **options):
+        days = rebuild_reservation_days(options['barbershop'])
+        self.stdout.write(self.style.SUCCESS(f'Se generaron {days} días con reservas'))
@@ -0,0 +1,29 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from core.deletions import run_deletion_job, stale_deletion_jobs
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Retoma las eliminaciones de cortes que quedaron a medias (p. ej. tras un reinicio)'
+
+    def handle(self, *args, **options):
+        resumed = failed = 0
+        for job in stale_deletion_jobs():
+            self.stdout.write(f'Retomando eliminación {job.id}: {job.deleted}/{job.total}')
+            # Un trabajo que falla queda como 'failed' y no frena a los demás
+            try:
+                job = run_deletion_job(job.id)
+            except Exception:
+                logger.exception('Falló la eliminación %s', job.id)
+                self.stderr.write(f'  falló: {job.id}')
+                failed += 1
+                continue
+            self.stdout.write(f'  {job.status}: {job.deleted}/{job.total}')
+            resumed += 1
+        self.stdout.write(self.style.SUCCESS(f'Se retomaron {resumed} eliminaciones'))
+        if failed:
+            self.stderr.write(self.style.ERROR(f'Fallaron {failed} eliminaciones'))
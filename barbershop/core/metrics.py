@@ -0,0 +1,227 @@
+# core/metrics.py
+# Métricas de requests en formato Prometheus. Cada proceso acumula en
+# memoria y cada METRICS_FLUSH_INTERVAL segundos vuelca su copia a
+# METRICS_DIR/metrics_<pid>_<inicio>.json; el endpoint suma los archivos de
+# los workers de gunicorn vivos en la máquina.
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    'barbershop_http_request_duration_seconds': ('Duración de la request', LATENCY_BUCKETS),
+    'barbershop_http_request_db_queries': ('Consultas SQL por request', QUERY_COUNT_BUCKETS),
+    'barbershop_http_response_size_bytes': ('Tamaño de la respuesta (sin streaming)', SIZE_BUCKETS),
+}
+COUNTERS = {
+    'barbershop_http_db_query_seconds_total': 'Tiempo total en consultas SQL',
+    'barbershop_license_rejections_total': 'Requests rechazadas por LicenseMiddleware',
+}
+
+_lock = threading.Lock()
+# (nombre, etiquetas) -> [conteos por bucket..., suma, total] o valor del contador
+_histograms = {}
+_counters = {}
+_last_flush = time.monotonic()
+# pid e id del worker; se recalcula tras un fork
+_worker = {'pid': None, 'id': None}
+
+logger = logging.getLogger(__name__)
+
+# Consultas de la request en curso; se propaga a los hilos de sync_to_async
+_current_queries = ContextVar('current_queries', default=None)
+
+
+def _labels(**labels):
+    return tuple(sorted(labels.items()))
+
+
+def observe(name, value, **labels):
+    buckets = HISTOGRAMS[name][1]
+    key = (name, _labels(**labels))
+    with _lock:
+        data = _histograms.get(key)
+        if data is None:
+            data = _histograms[key] = [0] * (len(buckets) + 2)
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                data[index] += 1
+                break
+        data[-2] += value
+        data[-1] += 1
+
+
+def increment(name, value=1, **labels):
+    key = (name, _labels(**labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def record_license_rejection(code):
+    increment('barbershop_license_rejections_total', code=code)
+
+
+# Conteo de consultas: un execute_wrapper en cada conexión (ver
+# core/signals.py) que solo suma si hay una request midiéndose
+class QueryStats:
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+def count_queries(execute, sql, params, many, context):
+    stats = _current_queries.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - started
+
+
+def start_request():
+    stats = QueryStats()
+    return stats, _current_queries.set(stats)
+
+
+def finish_request(token, route, method, status, duration, stats, size):
+    _current_queries.reset(token)
+    observe('barbershop_http_request_duration_seconds', duration, route=route, method=method, status=status)
+    observe('barbershop_http_request_db_queries', stats.count, route=route, method=method)
+    increment('barbershop_http_db_query_seconds_total', stats.seconds, route=route, method=method)
+    if size is not None:
+        observe('barbershop_http_response_size_bytes', size, route=route, method=method)
+    maybe_flush()
+
+
+# Almacén compartido entre workers. El nombre lleva el pid y el momento en
+# que arrancó el worker: si el sistema reutiliza un pid, el proceso nuevo no
+# pisa el archivo del anterior.
+def _worker_id():
+    pid = os.getpid()
+    if _worker['pid'] != pid:
+        _worker.update(pid=pid, id=f'{pid}_{time.time_ns()}')
+    return _worker['id']
+
+
+def _metrics_path():
+    return os.path.join(settings.METRICS_DIR, f'metrics_{_worker_id()}.json')
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def flush():
+    global _last_flush
+    with _lock:
+        snapshot = {
+            'histograms': [[name, labels, data] for (name, labels), data in _histograms.items()],
+            'counters': [[name, labels, value] for (name, labels), value in _counters.items()],
+        }
+        _last_flush = time.monotonic()
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = _metrics_path()
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as output:
+        json.dump(snapshot, output)
+    os.replace(tmp_path, path)
+
+
+def maybe_flush():
+    if time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL:
+        try:
+            flush()
+        except OSError:
+            logger.exception('No se pudieron guardar las métricas')
+
+
+atexit.register(maybe_flush)
+
+
+def _merged():
+    # Solo se suman los workers vivos: el archivo de uno que terminó se borra
+    # y sus contadores dejan de sumarse. Prometheus lo ve como un reinicio de
+    # contador, igual que al reiniciar el servidor, y rate() lo compensa.
+    histograms, counters = {}, {}
+    directory = settings.METRICS_DIR
+    for filename in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        if not (filename.startswith('metrics_') and filename.endswith('.json')):
+            continue
+        path = os.path.join(directory, filename)
+        pid = filename[len('metrics_'):].split('_', 1)[0].split('.', 1)[0]
+        if not pid.isdigit() or not _pid_alive(int(pid)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as source:
+                snapshot = json.load(source)
+        except (OSError, ValueError):
+            continue
+        for name, labels, data in snapshot['histograms']:
+            key = (name, tuple(tuple(label) for label in labels))
+            total = histograms.setdefault(key, [0] * len(data))
+            for index, value in enumerate(data):
+                total[index] += value
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(tuple(label) for label in labels))
+            counters[key] = counters.get(key, 0) + value
+    return histograms, counters
+
+
+def _format_labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    escaped = (
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in items
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def render_prometheus():
+    """Texto en el formato de exposición de Prometheus (0.0.4) con todos los workers."""
+    flush()
+    histograms, counters = _merged()
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (metric, labels), data in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, data):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, le=bound)} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels, le="+Inf")} {data[-1]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {data[-2]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {data[-1]}')
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
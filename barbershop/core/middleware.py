@@ -1,30 +1,87 @@
 # core/middleware.py
 from django.http import JsonResponse
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from core.models import License, Barbershop
+from core.cache import aget_license_revision, get_license_state, get_license_revision, set_license_revision
+from core.authentication import VerifiedAccessToken, LazyTokenUser, license_revision
 from rest_framework_simplejwt.tokens import AccessToken
 from django.contrib.auth.models import User
+import json
+import time
+
 import jwt
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.conf import settings
+from django.urls import Resolver404, resolve
+from core import metrics, profiling
 
 class LicenseMiddleware:
+    # Funciona igual bajo WSGI y ASGI. En ASGI el camino por claims (el de
+    # casi todas las requests) lee la huella con la API async de la caché;
+    # solo el camino completo, que puede consultar la base de datos, pasa a
+    # un hilo.
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
 
-    def __call__(self, request):
+    @staticmethod
+    def _uses_claims(decoded_token, machine_id):
+        return bool(decoded_token.get('lic')) and bool(machine_id)
+
+    def _authorize_from_claims(self, request, token, decoded_token, user_id, machine_id, revision):
+        # Autoriza solo con los claims del token si siguen vigentes frente a la
+        # huella cacheada (`revision`). Cualquier duda (huella desconocida,
+        # licencia vencida, otra máquina) se resuelve por el camino completo,
+        # que es el que devuelve los errores.
+        claims = decoded_token.get('lic')
+        if not claims or not machine_id:
+            return False
+        if claims.get('rev') != revision:
+            return False
+        if claims.get('mid') != machine_id or claims.get('exp', 0) <= timezone.now().timestamp():
+            return False
+
+        barbershop_id = claims['bid']
+        request.jwt_user = LazyTokenUser(
+            user_id, lambda: get_license_state(user_id, machine_id)['user']
+        )
+        request.jwt_token = VerifiedAccessToken(token, decoded_token)
+        request.barbershop_id = barbershop_id
+        request.barbershop = SimpleLazyObject(
+            lambda: Barbershop.objects.select_related('license').get(pk=barbershop_id)
+        )
+        request.license = SimpleLazyObject(lambda: request.barbershop.license)
+        return True
+
+    def _check_token(self, request):
+        """
+        Lo que no necesita la base de datos ni la caché. Devuelve None si la
+        request no se revisa, una respuesta de error, o (token, decoded_token,
+        user_id, machine_id) para validar la licencia por claims o por el
+        camino completo.
+        """
         # Rutas exentas de verificación
         exempt_paths = [
             '/admin',
             '/api/auth/',
-            '/api/license/activate/'
+            '/api/license/activate/',
+            '/api/license/cache-stats/',
+            '/api/metrics/',
+            '/api/profiling/',
         ]
         
         if any(request.path.startswith(path) for path in exempt_paths):
-            return self.get_response(request)
+            return None
 
         # Solo verificar rutas API
         if not request.path.startswith('/api/'):
-            return self.get_response(request)
+            return None
 
         try:
             # Obtener y validar el token
@@ -40,13 +97,39 @@ class LicenseMiddleware:
             token = auth_header.split(' ')[1]
             
             try:
-                # Decodificar el token
+                # Decodificar el token (única verificación de firma de la request)
                 decoded_token = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+                if decoded_token.get('token_type') != 'access':
+                    raise jwt.InvalidTokenError('Se esperaba un token de acceso')
                 user_id = decoded_token.get('user_id')
-                user = User.objects.get(id=user_id)
-                
-                # Obtener la barbería y su licencia
-                barbershop = Barbershop.objects.filter(owner=user).first()
+                machine_id = request.headers.get('X-Machine-ID')
+                return token, decoded_token, user_id, machine_id
+
+            except jwt.ExpiredSignatureError:
+                return JsonResponse({
+                    'error': 'Token expirado',
+                    'code': 'TOKEN_EXPIRED'
+                }, status=401)
+            except jwt.InvalidTokenError:
+                return JsonResponse({
+                    'error': 'Token inválido',
+                    'code': 'INVALID_TOKEN'
+                }, status=401)
+
+        except Exception as e:
+            print(f"Error en LicenseMiddleware: {str(e)}")
+            return JsonResponse({
+                'error': 'Error interno del servidor',
+                'code': 'SERVER_ERROR'
+            }, status=500)
+
+    def _check_license(self, request, token, decoded_token, user_id, machine_id):
+        """Camino completo: devuelve None si la licencia es válida o la respuesta de error."""
+        try:
+            try:
+                # Obtener el usuario, la barbería y su licencia (cacheados por usuario y máquina)
+                state = get_license_state(user_id, machine_id)
+                barbershop = state['barbershop']
                 if not barbershop or not barbershop.license:
                     return JsonResponse({
                         'error': 'No hay licencia asociada a esta barbería',
@@ -66,10 +149,9 @@ class LicenseMiddleware:
                         'support_message': 'Para soporte o validar su licencia, contactar con Stephano Cornejo Córdova al 940183490'
                     }, status=403)
 
-                # Validar la fecha de expiración
+                # Validar la fecha de expiración. Solo lectura: las vencidas
+                # se desactivan por lotes con el comando expire_licenses
                 if license.expires_at < timezone.now():
-                    license.is_active = False
-                    license.save()
                     return JsonResponse({
                         'error': 'La licencia ha expirado',
                         'code': 'EXPIRED_LICENSE',
@@ -78,7 +160,6 @@ class LicenseMiddleware:
                     }, status=403)
 
                 # Validar machine_id
-                machine_id = request.headers.get('X-Machine-ID')
                 if not machine_id:
                     return JsonResponse({
                         'error': 'Identificador de máquina no proporcionado',
@@ -95,18 +176,17 @@ class LicenseMiddleware:
                         'support_message': 'Para soporte o validar su licencia, contactar con Stephano Cornejo Córdova al 940183490'
                     }, status=403)
 
-                return self.get_response(request)
+                # Compartir el resultado con la autenticación de DRF y las vistas
+                request.jwt_user = state['user']
+                request.jwt_token = VerifiedAccessToken(token, decoded_token)
+                request.barbershop_id = barbershop.pk
+                request.barbershop = barbershop
+                request.license = license
+
+                # Los claims firmados con esta huella pueden validarse sin consultas
+                set_license_revision(user_id, license_revision(state['user'], barbershop, license))
+                return None
 
-            except jwt.ExpiredSignatureError:
-                return JsonResponse({
-                    'error': 'Token expirado',
-                    'code': 'TOKEN_EXPIRED'
-                }, status=401)
-            except jwt.InvalidTokenError:
-                return JsonResponse({
-                    'error': 'Token inválido',
-                    'code': 'INVALID_TOKEN'
-                }, status=401)
             except User.DoesNotExist:
                 return JsonResponse({
                     'error': 'Usuario no encontrado',
@@ -120,4 +200,136 @@ class LicenseMiddleware:
                 'code': 'SERVER_ERROR'
             }, status=500)
 
-        return self.get_response(request)
\ No newline at end of file
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        result = self._check_token(request)
+        if isinstance(result, tuple):
+            # Camino sin base de datos: claims de licencia firmados en el token
+            _, decoded_token, user_id, machine_id = result
+            revision = None
+            if self._uses_claims(decoded_token, machine_id):
+                revision = get_license_revision(user_id)
+            if self._authorize_from_claims(request, *result, revision):
+                result = None
+            else:
+                result = self._check_license(request, *result)
+        if result is not None:
+            return self._rejected(result)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        result = self._check_token(request)
+        if isinstance(result, tuple):
+            _, decoded_token, user_id, machine_id = result
+            revision = None
+            if self._uses_claims(decoded_token, machine_id):
+                revision = await aget_license_revision(user_id)
+            if self._authorize_from_claims(request, *result, revision):
+                result = None
+            else:
+                result = await sync_to_async(self._check_license)(request, *result)
+        if result is not None:
+            return self._rejected(result)
+        return await self.get_response(request)
+
+    def _rejected(self, response):
+        metrics.record_license_rejection(json.loads(response.content).get('code', 'UNKNOWN'))
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Latencia, consultas SQL y tamaño de respuesta por ruta (ver core/metrics.py).
+    Va primero en MIDDLEWARE para medir también a LicenseMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _route(self, request):
+        # Nombre de la vista (p. ej. haircut-balance): pocas series aunque
+        # cambien los ids de la URL. Las rechazadas antes de resolver la URL
+        # se resuelven aquí.
+        match = request.resolver_match
+        if match is None:
+            try:
+                match = resolve(request.path_info)
+            except Resolver404:
+                return 'unmatched'
+        return match.view_name or match.route
+
+    def _finish(self, request, response, started, stats, token):
+        size = None if response.streaming else len(response.content)
+        metrics.finish_request(
+            token, self._route(request), request.method, response.status_code,
+            time.perf_counter() - started, stats, size,
+        )
+        return response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        stats, token = metrics.start_request()
+        return self._finish(request, self.get_response(request), started, stats, token)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        stats, token = metrics.start_request()
+        return self._finish(request, await self.get_response(request), started, stats, token)
+
+
+class ProfilingMiddleware:
+    """
+    Perfila la request con cProfile cuando se pide con X-Profile o ?_profile=1
+    y el usuario está autorizado (ver core/profiling.py). Va después de
+    LicenseMiddleware para conocer al usuario del token. Si no se pide, el
+    costo es solo revisar la cabecera y la query string.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not profiling.profiling_requested(request) or not profiling.profiling_allowed(request):
+            return self.get_response(request)
+
+        profiler, token = profiling.start_profile()
+        try:
+            response = self.get_response(request)
+        finally:
+            queries = profiling.stop_profile(profiler, token)
+        response['X-Profile-Id'] = profiling.save_profile(request, profiler, queries, response)
+        return response
+
+    async def __acall__(self, request):
+        if not profiling.profiling_requested(request):
+            return await self.get_response(request)
+        if not await sync_to_async(profiling.profiling_allowed)(request):
+            return await self.get_response(request)
+
+        # Bajo ASGI cProfile ve el hilo del event loop (las vistas async); las
+        # consultas SQL se registran igual desde los hilos del ORM
+        profiler, token = profiling.start_profile()
+        try:
+            response = await self.get_response(request)
+        finally:
+            queries = profiling.stop_profile(profiler, token)
+        response['X-Profile-Id'] = await sync_to_async(profiling.save_profile)(
+            request, profiler, queries, response
+        )
+        return response
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:49
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+import zoneinfo
+
+
+def build_haircut_stats(apps, schema_editor):
+    # Misma agrupación que core.stats.rebuild_haircut_stats; business_date
+    # todavía no existe, así que el día local se calcula desde created_at
+    Haircut = apps.get_model('core', 'Haircut')
+    HaircutDailyStats = apps.get_model('core', 'HaircutDailyStats')
+    rows = (
+        Haircut.objects
+        .values('barbershop_id', 'barber_id', 'payment_method',
+                date=TruncDate('created_at', tzinfo=zoneinfo.ZoneInfo(settings.TIME_ZONE)))
+        .annotate(cut_count=Count('id'), total_amount=Sum('amount'))
+        .order_by()
+    )
+    HaircutDailyStats.objects.bulk_create(
+        (HaircutDailyStats(**row) for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HaircutDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_method', models.CharField(choices=[('CASH', 'Efectivo'), ('YAPE', 'Yape')], max_length=10)),
+                ('date', models.DateField()),
+                ('cut_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('barber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='core.barber')),
+                ('barbershop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='core.barbershop')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['barbershop', 'date'], name='core_haircu_barbers_f28479_idx')],
+                'unique_together': {('barbershop', 'barber', 'payment_method', 'date')},
+            },
+        ),
+        migrations.RunPython(build_haircut_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:52
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+import zoneinfo
+
+
+def backfill_business_date(apps, schema_editor):
+    Haircut = apps.get_model('core', 'Haircut')
+    tz = zoneinfo.ZoneInfo(settings.TIME_ZONE)
+    batch = []
+    for haircut in Haircut.objects.only('id', 'created_at').order_by('id').iterator(chunk_size=2000):
+        haircut.business_date = timezone.localdate(haircut.created_at, tz)
+        batch.append(haircut)
+        if len(batch) >= 2000:
+            Haircut.objects.bulk_update(batch, ['business_date'])
+            batch = []
+    if batch:
+        Haircut.objects.bulk_update(batch, ['business_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_haircutdailystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='haircut',
+            name='business_date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_business_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='haircut',
+            name='business_date',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='haircut',
+            index=models.Index(fields=['barbershop', 'business_date'], name='core_haircu_barbers_c3ee1a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='haircut',
+            index=models.Index(fields=['barbershop', 'created_at'], name='core_haircu_barbers_fb77c4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='license',
+            index=models.Index(fields=['machine_id', 'is_active', 'expires_at'], name='core_licens_machine_d059f9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['barbershop', 'is_active', 'date', 'time'], name='core_reserv_barbers_9fa032_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_haircut_business_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='haircut',
+            name='client_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='haircut',
+            constraint=models.UniqueConstraint(condition=models.Q(('client_key__isnull', False)), fields=('barbershop', 'client_key'), name='unique_haircut_client_key'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_haircut_client_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('upsert', 'Alta o cambio'), ('delete', 'Baja')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('barbershop', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.barbershop')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['barbershop', 'id'], name='core_change_barbers_d89346_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:55
+
+import datetime
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_reservation_days(apps, schema_editor):
+    Reservation = apps.get_model('core', 'Reservation')
+    ReservationDay = apps.get_model('core', 'ReservationDay')
+    bitmaps = {}
+    for shop_id, date, time in Reservation.objects.filter(is_active=True).values_list(
+        'barbershop_id', 'date', 'time'
+    ).iterator():
+        key = (shop_id, date)
+        bitmaps[key] = bitmaps.get(key, 0) | (1 << ((time.hour * 60 + time.minute) // 30))
+    ReservationDay.objects.bulk_create(
+        [ReservationDay(barbershop_id=shop_id, date=date, booked=booked)
+         for (shop_id, date), booked in bitmaps.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_changelog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='barbershop',
+            name='closing_time',
+            field=models.TimeField(default=datetime.time(21, 0)),
+        ),
+        migrations.AddField(
+            model_name='barbershop',
+            name='opening_time',
+            field=models.TimeField(default=datetime.time(9, 0)),
+        ),
+        migrations.CreateModel(
+            name='ReservationDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('booked', models.BigIntegerField(default=0)),
+                ('barbershop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservation_days', to='core.barbershop')),
+            ],
+            options={
+                'unique_together': {('barbershop', 'date')},
+            },
+        ),
+        migrations.RunPython(build_reservation_days, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_reservation_availability'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='reservation',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('barbershop', 'date', 'time'), name='unique_active_reservation_slot'),
+        ),
+    ]
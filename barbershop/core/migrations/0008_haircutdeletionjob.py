@@ -0,0 +1,34 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_reservation_active_slot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HaircutDeletionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('archiving', 'Archivando'), ('deleting', 'Eliminando'), ('done', 'Terminado'), ('failed', 'Fallido')], default='pending', max_length=10)),
+                ('max_id', models.BigIntegerField()),
+                ('total', models.IntegerField()),
+                ('deleted', models.IntegerField(default=0)),
+                ('archive', models.BooleanField(default=False)),
+                ('archive_path', models.CharField(blank=True, max_length=500)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('barbershop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deletion_jobs', to='core.barbershop')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['barbershop', 'status'], name='core_haircu_barbers_44f226_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.10 on 2026-10-18 10:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_haircutdeletionjob'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='haircut',
+            name='core_haircu_barbers_fb77c4_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='reservation',
+            name='core_reserv_barbers_9fa032_idx',
+        ),
+        migrations.AddIndex(
+            model_name='haircut',
+            index=models.Index(fields=['barbershop', 'created_at', 'id'], name='core_haircu_barbers_ac3609_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['barbershop', 'is_active', 'date', 'time', 'id'], name='core_reserv_barbers_d54a0d_idx'),
+        ),
+    ]
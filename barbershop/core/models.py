@@ -2,9 +2,24 @@
 from django.db import models
 from django.contrib.auth.models import User
 import uuid
+import datetime
 from django.utils import timezone
 
 
+def business_date_for(value):
+    # Las consultas por día usan la fecha local de la barbería, no la de UTC
+    return timezone.localdate(value, timezone.get_default_timezone())
+
+
+class LicenseQuerySet(models.QuerySet):
+    def valid(self):
+        return self.filter(is_active=True, expires_at__gt=timezone.now())
+
+    def expired(self):
+        # Vencidas que siguen marcadas como activas (ver expire_licenses)
+        return self.filter(is_active=True, expires_at__lte=timezone.now())
+
+
 class License(models.Model):
     key = models.UUIDField(default=uuid.uuid4, unique=True)
     machine_id = models.CharField(max_length=255, blank=True, null=True)
@@ -13,6 +28,11 @@ class License(models.Model):
     expires_at = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = LicenseQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=['machine_id', 'is_active', 'expires_at'])]
+
     def __str__(self):
         return f"License {self.key}"
 
@@ -23,6 +43,9 @@ class Barbershop(models.Model):
     name = models.CharField(max_length=255)
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     license = models.OneToOneField(License, on_delete=models.CASCADE)
+    # Horario de atención usado para calcular los turnos libres
+    opening_time = models.TimeField(default=datetime.time(9, 0))
+    closing_time = models.TimeField(default=datetime.time(21, 0))
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -49,11 +72,51 @@ class Haircut(models.Model):
     payment_method = models.CharField(max_length=10, choices=PAYMENT_CHOICES)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Día local (America/Lima) del corte, guardado para poder indexarlo
+    business_date = models.DateField(editable=False)
+    # Clave de idempotencia que envían los clientes offline al sincronizar
+    client_key = models.CharField(max_length=64, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['barbershop', 'business_date']),
+            # Paginación por cursor del listado: (-created_at, -id)
+            models.Index(fields=['barbershop', 'created_at', 'id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['barbershop', 'client_key'],
+                condition=models.Q(client_key__isnull=False),
+                name='unique_haircut_client_key',
+            ),
+        ]
 
     def __str__(self):
         client = self.client_name or "Cliente anónimo"
         return f"Corte de {client} por {self.barber.name}"
 
+    def save(self, *args, **kwargs):
+        if self.business_date is None:
+            self.business_date = business_date_for(self.created_at or timezone.now())
+        super().save(*args, **kwargs)
+
+class HaircutDailyStats(models.Model):
+    # Acumulado diario por barbero y método de pago, mantenido por señales
+    barbershop = models.ForeignKey(Barbershop, on_delete=models.CASCADE, related_name='daily_stats')
+    barber = models.ForeignKey(Barber, on_delete=models.CASCADE, related_name='daily_stats')
+    payment_method = models.CharField(max_length=10, choices=Haircut.PAYMENT_CHOICES)
+    date = models.DateField()
+    cut_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['barbershop', 'barber', 'payment_method', 'date']
+        indexes = [models.Index(fields=['barbershop', 'date'])]
+
+    def __str__(self):
+        return f"{self.date} {self.barber_id} {self.payment_method}: {self.cut_count}"
+
 class Reservation(models.Model):
     barbershop = models.ForeignKey('Barbershop', on_delete=models.CASCADE)
     client_name = models.CharField(max_length=255)
@@ -65,7 +128,16 @@ class Reservation(models.Model):
 
     class Meta:
         ordering = ['date', 'time']
-        unique_together = ['barbershop', 'date', 'time']
+        # Solo las reservas activas ocupan el turno; insertar es lo que lo reserva
+        constraints = [
+            models.UniqueConstraint(
+                fields=['barbershop', 'date', 'time'],
+                condition=models.Q(is_active=True),
+                name='unique_active_reservation_slot',
+            ),
+        ]
+        # Listado y paginación por cursor: (date, time, id) de las activas
+        indexes = [models.Index(fields=['barbershop', 'is_active', 'date', 'time', 'id'])]
 
     def __str__(self):
         return f"Reserva de {self.client_name} para {self.date} {self.time}"
@@ -75,4 +147,76 @@ class Reservation(models.Model):
         minutes = self.time.minute
         rounded_minutes = (minutes // 30) * 30
         self.time = self.time.replace(minute=rounded_minutes, second=0, microsecond=0)
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class ReservationDay(models.Model):
+    # Mapa de bits de los turnos de 30 minutos reservados en el día:
+    # el bit n corresponde al turno que empieza a las n * 30 minutos
+    barbershop = models.ForeignKey(Barbershop, on_delete=models.CASCADE, related_name='reservation_days')
+    date = models.DateField()
+    booked = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['barbershop', 'date']
+
+    def __str__(self):
+        return f"{self.date}: {self.booked:048b}"
+
+class ChangeLog(models.Model):
+    # Registro de altas, cambios y bajas por barbería para la sincronización
+    # incremental; el id es el cursor que guardan los clientes
+    ACTION_CHOICES = [
+        ('upsert', 'Alta o cambio'),
+        ('delete', 'Baja'),
+    ]
+
+    # Sin restricción en la base de datos: las bajas en cascada de una
+    # barbería siguen registrando cambios mientras se borra
+    barbershop = models.ForeignKey(
+        Barbershop, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['barbershop', 'id'])]
+
+    def __str__(self):
+        return f"{self.action} {self.model} {self.object_id}"
+
+class HaircutDeletionJob(models.Model):
+    # "Eliminar todos los cortes" por lotes en segundo plano; el avance queda
+    # guardado para poder seguir después de un reinicio del worker
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('archiving', 'Archivando'),
+        ('deleting', 'Eliminando'),
+        ('done', 'Terminado'),
+        ('failed', 'Fallido'),
+    ]
+
+    barbershop = models.ForeignKey(Barbershop, on_delete=models.CASCADE, related_name='deletion_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # Solo se borran los cortes que existían al pedirlo (id <= max_id)
+    max_id = models.BigIntegerField()
+    total = models.IntegerField()
+    deleted = models.IntegerField(default=0)
+    archive = models.BooleanField(default=False)
+    archive_path = models.CharField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Se actualiza en cada lote: si deja de moverse, el worker que lo corría murió
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['barbershop', 'status'])]
+
+    def __str__(self):
+        return f"Eliminación {self.id} ({self.status}): {self.deleted}/{self.total}"
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
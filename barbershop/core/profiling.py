@@ -0,0 +1,144 @@
+# core/profiling.py
+# Perfilado a pedido de una sola request: con la cabecera "X-Profile: 1" o
+# "?_profile=1", si quien la hace es staff o un admin activó el perfilado
+# para su usuario, la request corre bajo cProfile y se guardan el volcado de
+# pstats y las consultas SQL lentas con su plan de ejecución.
+import cProfile
+import json
+import os
+import re
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = '_profile'
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+# Consultas lentas de la request perfilada; None fuera de ella
+_slow_queries = ContextVar('slow_queries', default=None)
+
+
+def _user_key(user_id):
+    return f'profiling:user:{user_id}'
+
+
+def enable_profiling(user_id, minutes):
+    # En la caché compartida (ver CACHES) para que valga en todos los workers
+    cache.set(_user_key(user_id), True, minutes * 60)
+
+
+def disable_profiling(user_id):
+    cache.delete(_user_key(user_id))
+
+
+def _truthy(value):
+    return (value or '').strip().lower() in TRUE_VALUES
+
+
+def profiling_requested(request):
+    # Filtro barato primero (dos búsquedas en cadenas); solo si pasa se lee
+    # el valor, así "?x_profile=1" o "_profile=0" no activan el perfilado
+    query_string = request.META.get('QUERY_STRING', '')
+    if PROFILE_HEADER not in request.META and PROFILE_PARAM not in query_string:
+        return False
+    return _truthy(request.META.get(PROFILE_HEADER)) or _truthy(request.GET.get(PROFILE_PARAM))
+
+
+def profiling_allowed(request):
+    user = getattr(request, 'jwt_user', None) or getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return False
+    return user.is_staff or bool(cache.get(_user_key(user.pk)))
+
+
+def capture_slow_queries(execute, sql, params, many, context):
+    queries = _slow_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= settings.PROFILE_SLOW_SQL_MS:
+            queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'params': None if many else params,
+                'many': many,
+                'ms': round(elapsed_ms, 2),
+            })
+
+
+def start_profile():
+    profiler = cProfile.Profile()
+    token = _slow_queries.set([])
+    profiler.enable()
+    return profiler, token
+
+
+def stop_profile(profiler, token):
+    profiler.disable()
+    queries = _slow_queries.get()
+    _slow_queries.reset(token)
+    return queries
+
+
+def _explain(query):
+    if query['many'] or not re.match(r'\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', query['sql'], re.I):
+        return None
+    connection = connections[query['alias']]
+    # EXPLAIN sin ANALYZE: muestra el plan, no vuelve a ejecutar la consulta
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + query['sql'], query['params'])
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+    except Exception as e:
+        return [f'No se pudo obtener el plan: {e}']
+
+
+def save_profile(request, profiler, queries, response):
+    """Guarda <id>.prof (pstats) y <id>.json (resumen y SQL lenta); devuelve el id."""
+    user = getattr(request, 'jwt_user', None) or request.user
+    slug = re.sub(r'[^a-zA-Z0-9]+', '-', request.path).strip('-')[:60]
+    profile_id = f"{timezone.now().strftime('%Y%m%d-%H%M%S-%f')}_{user.pk}_{request.method}_{slug}"
+    os.makedirs(settings.PROFILES_DIR, exist_ok=True)
+    base = os.path.join(settings.PROFILES_DIR, profile_id)
+
+    profiler.dump_stats(f'{base}.prof')
+    for query in queries:
+        query['plan'] = _explain(query)
+        query['params'] = repr(query['params'])
+    with open(f'{base}.json', 'w') as output:
+        json.dump({
+            'path': request.get_full_path(),
+            'method': request.method,
+            'user_id': user.pk,
+            'status': response.status_code,
+            'created_at': timezone.now().isoformat(),
+            'slow_sql_ms': settings.PROFILE_SLOW_SQL_MS,
+            'slow_queries': queries,
+        }, output, indent=2, ensure_ascii=False)
+    return profile_id
+
+
+def list_profiles(limit=50):
+    directory = settings.PROFILES_DIR
+    if not os.path.isdir(directory):
+        return []
+    names = sorted((name for name in os.listdir(directory) if name.endswith('.prof')), reverse=True)
+    return [name[:-len('.prof')] for name in names[:limit]]
+
+
+def profile_file(profile_id, extension):
+    # Solo archivos del directorio de perfiles, sin rutas relativas
+    if os.path.basename(profile_id) != profile_id or extension not in ('prof', 'json'):
+        return None
+    path = os.path.join(settings.PROFILES_DIR, f'{profile_id}.{extension}')
+    return path if os.path.isfile(path) else None
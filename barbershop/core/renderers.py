@@ -0,0 +1,36 @@
+# core/renderers.py
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+# Las exportaciones se envían como StreamingHttpResponse; estos renderers
+# existen para que ?format=csv / ?format=ndjson pasen la negociación de DRF
+# y solo dan formato a las respuestas de error.
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        items = data.items() if isinstance(data, dict) else [('detail', data)]
+        for key, value in items:
+            writer.writerow([key, value])
+        return buffer.getvalue().encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, ensure_ascii=False, default=str) + '\n').encode(self.charset)
@@ -0,0 +1,123 @@
+# core/reports.py
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .models import Barber, Haircut, HaircutDailyStats
+from .tasks import run_in_background
+
+logger = logging.getLogger(__name__)
+
+_pending_lock = threading.Lock()
+_pending = set()
+
+
+def report_data_version(barbershop_id, start_date, end_date):
+    """
+    Sello que cambia cuando cambia cualquier corte del rango: los acumulados
+    diarios se tocan en cada alta, edición o baja. Los nombres de los barberos
+    también aparecen en el reporte, así que forman parte del sello.
+    """
+    stats = HaircutDailyStats.objects.filter(
+        barbershop_id=barbershop_id, date__range=[start_date, end_date]
+    ).aggregate(cuts=Sum('cut_count'), total=Sum('total_amount'), updated=Max('updated_at'))
+    barbers = list(
+        Barber.objects.filter(barbershop_id=barbershop_id).order_by('id').values_list('id', 'name')
+    )
+    return hashlib.sha256(repr((stats, barbers)).encode()).hexdigest()
+
+
+def report_pdf_path(barbershop_id, start_date, end_date):
+    version = report_data_version(barbershop_id, start_date, end_date)
+    digest = hashlib.sha256(
+        f'{barbershop_id}:{start_date}:{end_date}:{version}'.encode()
+    ).hexdigest()[:32]
+    return Path(settings.REPORTS_ROOT) / str(barbershop_id) / f'{start_date}_{end_date}_{digest}.pdf'
+
+
+def _money(value):
+    return f'S/. {value or 0:.2f}'
+
+
+def build_report_pdf(barbershop_id, start_date, end_date, path):
+    haircuts = Haircut.objects.filter(
+        barbershop_id=barbershop_id, business_date__range=[start_date, end_date]
+    )
+    totals = haircuts.aggregate(
+        total=Sum('amount'),
+        total_cash=Sum('amount', filter=Q(payment_method='CASH')),
+        total_yape=Sum('amount', filter=Q(payment_method='YAPE')),
+    )
+    payment_labels = dict(Haircut.PAYMENT_CHOICES)
+
+    rows = [['Fecha', 'Cliente', 'Barbero', 'Método de Pago', 'Monto']]
+    for created_at, client_name, barber_name, payment_method, amount in (
+        haircuts.order_by('created_at', 'id')
+        .values_list('created_at', 'client_name', 'barber__name', 'payment_method', 'amount')
+        .iterator(chunk_size=2000)
+    ):
+        rows.append([
+            timezone.localtime(created_at).strftime('%d/%m/%Y %H:%M'),
+            client_name or 'Cliente Anónimo',
+            barber_name,
+            payment_labels.get(payment_method, payment_method),
+            _money(amount),
+        ])
+
+    styles = getSampleStyleSheet()
+    table = Table(rows, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f5f5f5')),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dddddd')),
+    ]))
+    story = [
+        Paragraph('Reporte de Cortes', styles['Title']),
+        Paragraph(f'Período: {start_date} - {end_date}', styles['Normal']),
+        Spacer(1, 12),
+        table,
+        Spacer(1, 18),
+        Paragraph('Resumen', styles['Heading3']),
+        Paragraph(f"Total Efectivo: {_money(totals['total_cash'])}", styles['Normal']),
+        Paragraph(f"Total Yape: {_money(totals['total_yape'])}", styles['Normal']),
+        Paragraph(f"Total General: {_money(totals['total'])}", styles['Normal']),
+    ]
+
+    # Escribir en un temporal y renombrar: nunca se sirve un PDF a medias
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    SimpleDocTemplate(str(tmp_path), pagesize=A4, title='Reporte de Cortes').build(story)
+    os.replace(tmp_path, path)
+
+    # Las versiones anteriores del mismo rango ya no se pueden pedir
+    for old in path.parent.glob(f'{start_date}_{end_date}_*.pdf'):
+        if old != path:
+            old.unlink(missing_ok=True)
+
+
+def _build_and_release(barbershop_id, start_date, end_date, path):
+    try:
+        build_report_pdf(barbershop_id, start_date, end_date, path)
+    finally:
+        with _pending_lock:
+            _pending.discard(str(path))
+
+
+def schedule_report_pdf(barbershop_id, start_date, end_date, path):
+    """Encola la generación del PDF si no se está generando ya en este proceso."""
+    with _pending_lock:
+        if str(path) in _pending:
+            return
+        _pending.add(str(path))
+    run_in_background(_build_and_release, barbershop_id, start_date, end_date, path)
@@ -1,9 +1,10 @@
 # core/serializers.py
 from rest_framework import serializers
-from .models import License, Barbershop, Barber, Haircut, Reservation
+from .models import License, Barbershop, Barber, Haircut, HaircutDeletionJob, Reservation
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.utils import timezone
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 
 class LicenseSerializer(serializers.ModelSerializer):
@@ -30,13 +31,59 @@ class HaircutSerializer(serializers.ModelSerializer):
         fields = ('id', 'barber', 'client_name', 'payment_method', 
                  'amount', 'created_at', 'barber_name', 'barbershop')
         read_only_fields = ('created_at', 'barbershop')
+    # La barbería la asigna HaircutViewSet.perform_create desde la request
+
+
+class HaircutRowEncoder:
+    """
+    Versión liviana de HaircutSerializer para listados: trabaja sobre filas de
+    values() (solo las columnas necesarias y el nombre del barbero por JOIN,
+    en una sola consulta) y produce exactamente la misma salida sin crear
+    instancias del modelo ni pasar por los campos del serializer en cada fila.
+    """
+    columns = (
+        'id', 'barber_id', 'client_name', 'payment_method',
+        'amount', 'created_at', 'barber__name', 'barbershop_id',
+    )
+
+    def __init__(self):
+        # Los mismos campos que usa HaircutSerializer, para el mismo formato
+        self.amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+        self.created_at = serializers.DateTimeField()
+
+    def encode(self, row):
+        return {
+            'id': row['id'],
+            'barber': row['barber_id'],
+            'client_name': row['client_name'],
+            'payment_method': row['payment_method'],
+            'amount': self.amount.to_representation(row['amount']),
+            'created_at': self.created_at.to_representation(row['created_at']),
+            'barber_name': row['barber__name'],
+            'barbershop': row['barbershop_id'],
+        }
+
+    def encode_many(self, rows):
+        return [self.encode(row) for row in rows]
+
+
+class HaircutDeletionJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+    archive_ready = serializers.SerializerMethodField()
+
+    class Meta:
+        model = HaircutDeletionJob
+        fields = ('id', 'status', 'total', 'deleted', 'progress', 'archive',
+                  'archive_ready', 'error', 'created_at', 'finished_at')
+
+    def get_progress(self, obj):
+        # Porcentaje eliminado (0-100)
+        return round(100 * obj.deleted / obj.total, 1) if obj.total else 100.0
+
+    def get_archive_ready(self, obj):
+        return bool(obj.archive_path)
+
 
-    def create(self, validated_data):
-        request = self.context.get('request')
-        barbershop = Barbershop.objects.get(owner=request.user)
-        validated_data['barbershop'] = barbershop
-        return super().create(validated_data)
-    
 class ReservationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Reservation
@@ -63,21 +110,67 @@ class ReservationSerializer(serializers.ModelSerializer):
                 {"date": "No se pueden hacer reservas para fechas/horas pasadas"}
             )
 
-        # Verificar si ya existe una reserva para esa fecha y hora
-        try:
-            barbershop = Barbershop.objects.get(owner=self.context['request'].user)
-            if Reservation.objects.filter(
-                barbershop=barbershop,
-                date=data['date'],
-                time=data['time'],
-                is_active=True
-            ).exists():
-                raise serializers.ValidationError(
-                    {"time": "Ya existe una reserva para esta fecha y hora"}
-                )
-        except Barbershop.DoesNotExist:
+        # Que el turno esté libre no se consulta aquí: lo garantiza el índice
+        # único parcial al insertar (ver ReservationViewSet.book)
+        return data
+
+class ReservationRecurrenceSerializer(serializers.Serializer):
+    start_date = serializers.DateField()
+    time = serializers.TimeField()
+    count = serializers.IntegerField(min_value=1, max_value=settings.RESERVATION_BULK_MAX_SLOTS)
+    every_days = serializers.IntegerField(min_value=1, max_value=365, default=7)
+
+    def validate(self, data):
+        # La última fecha tiene que existir: cerca de date.max la suma desborda
+        if (date.max - data['start_date']).days < data['every_days'] * (data['count'] - 1):
             raise serializers.ValidationError(
-                {"error": "No se encontró una barbería asociada a este usuario"}
+                {'count': 'La recurrencia termina después de la última fecha válida'}
             )
+        return data
+
+class ReservationBulkSerializer(serializers.Serializer):
+    # Varios turnos sueltos en "slots", o uno que se repite en "recurrence"
+    # (p. ej. todos los viernes a las 17:00 durante 8 semanas)
+    client_name = serializers.CharField(max_length=255, required=False)
+    details = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    slots = serializers.ListField(child=serializers.DictField(), required=False, allow_empty=False)
+    recurrence = ReservationRecurrenceSerializer(required=False)
+    all_or_nothing = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if ('slots' in data) == ('recurrence' in data):
+            raise serializers.ValidationError('Envíe "slots" o "recurrence", no ambos')
+        if 'recurrence' in data and not data.get('client_name'):
+            raise serializers.ValidationError({'client_name': 'Es obligatorio para reservas recurrentes'})
+        return data
+
+    def slot_count(self):
+        data = self.validated_data
+        return len(data['slots']) if 'slots' in data else data['recurrence']['count']
+
+    def expand_slots(self):
+        data = self.validated_data
+        if 'slots' in data:
+            # client_name y details generales valen para los turnos que no los traen
+            defaults = {field: data[field] for field in ('client_name', 'details') if field in data}
+            return [{**defaults, **slot} for slot in data['slots']]
+
+        recurrence = data['recurrence']
+        return [
+            {
+                'client_name': data['client_name'],
+                'details': data.get('details'),
+                'date': (recurrence['start_date'] + timedelta(days=recurrence['every_days'] * i)).isoformat(),
+                'time': recurrence['time'].strftime('%H:%M'),
+            }
+            for i in range(recurrence['count'])
+        ]
+
 
-        return data
\ No newline at end of file
+class HaircutBulkItemSerializer(serializers.Serializer):
+    # El barbero se valida en bloque en la vista (una sola consulta)
+    client_key = serializers.CharField(max_length=64)
+    barber = serializers.IntegerField()
+    client_name = serializers.CharField(max_length=255, required=False, allow_blank=True, allow_null=True)
+    payment_method = serializers.ChoiceField(choices=Haircut.PAYMENT_CHOICES)
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2)
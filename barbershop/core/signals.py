@@ -0,0 +1,150 @@
+# core/signals.py
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_cache, invalidate_cache_on_commit
+from .models import Barber, Barbershop, Haircut, License, Reservation
+from .stats import apply_haircut_delta, haircut_stats_key
+from .sync import log_change
+from .availability import mark_slot
+from .db import apply_sqlite_pragmas, sqlite_pragmas
+from .metrics import count_queries
+from .profiling import capture_slow_queries
+
+HAIRCUT_STATS_FIELDS = ('barbershop_id', 'barber_id', 'payment_method', 'amount', 'business_date')
+
+
+# Ajustes de cada conexión SQLite nueva (WAL, busy_timeout, ...)
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            apply_sqlite_pragmas(cursor, sqlite_pragmas(connection))
+
+
+# Conteo y tiempo de consultas por request para las métricas y SQL lenta
+@receiver(connection_created)
+def count_connection_queries(sender, connection, **kwargs):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+    # SQL lenta de las requests perfiladas (core/profiling.py)
+    if capture_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(capture_slow_queries)
+
+
+# Invalidación de la caché: estado de licencia (LicenseMiddleware) y datos
+# cacheados por barbería (balance, estadísticas)
+@receiver([post_save, post_delete], sender=License)
+def invalidate_cache_for_license(sender, instance, **kwargs):
+    barbershops = Barbershop.objects.filter(license_id=instance.pk).values_list('id', 'owner_id')
+    for barbershop_id, owner_id in barbershops:
+        invalidate_cache(barbershop_id=barbershop_id, user_id=owner_id)
+
+
+@receiver([post_save, post_delete], sender=Barbershop)
+def invalidate_cache_for_barbershop(sender, instance, **kwargs):
+    invalidate_cache(barbershop_id=instance.pk, user_id=instance.owner_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cache_for_user(sender, instance, **kwargs):
+    invalidate_cache(user_id=instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Barber)
+@receiver([post_save, post_delete], sender=Haircut)
+@receiver([post_save, post_delete], sender=Reservation)
+def invalidate_cache_for_tenant_data(sender, instance, **kwargs):
+    # Al confirmar: los acumulados y el registro de cambios se escriben en
+    # receptores posteriores (los de cortes vuelven a invalidar, ver
+    # apply_haircut_delta), así no depende del orden de registro
+    invalidate_cache_on_commit(barbershop_id=instance.barbershop_id)
+
+
+# Acumulados diarios de cortes (HaircutDailyStats)
+def _haircut_values(instance):
+    values = {field: getattr(instance, field) for field in HAIRCUT_STATS_FIELDS}
+    values['amount'] = Decimal(str(values['amount']))
+    return values
+
+
+@receiver(pre_save, sender=Haircut)
+def remember_previous_haircut(sender, instance, **kwargs):
+    instance._stats_previous = None
+    if instance.pk:
+        instance._stats_previous = (
+            Haircut.objects.filter(pk=instance.pk).values(*HAIRCUT_STATS_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=Haircut)
+def update_haircut_stats_on_save(sender, instance, created, **kwargs):
+    current = _haircut_values(instance)
+    previous = getattr(instance, '_stats_previous', None)
+    key = haircut_stats_key(current)
+
+    if previous is None:
+        apply_haircut_delta(*key, 1, current['amount'])
+    elif haircut_stats_key(previous) == key:
+        # Aunque el monto no cambie se toca updated_at: es el sello de datos
+        # con el que se cachean los reportes PDF
+        apply_haircut_delta(*key, 0, current['amount'] - previous['amount'])
+    else:
+        apply_haircut_delta(*haircut_stats_key(previous), -1, -previous['amount'], create=False)
+        apply_haircut_delta(*key, 1, current['amount'])
+
+
+@receiver(post_delete, sender=Haircut)
+def update_haircut_stats_on_delete(sender, instance, **kwargs):
+    values = _haircut_values(instance)
+    apply_haircut_delta(*haircut_stats_key(values), -1, -values['amount'], create=False)
+
+
+# Registro de cambios para la sincronización incremental (/api/changes/)
+@receiver(post_save, sender=Barber)
+@receiver(post_save, sender=Haircut)
+@receiver(post_save, sender=Reservation)
+def log_synced_save(sender, instance, **kwargs):
+    log_change(instance, 'upsert')
+
+
+@receiver(post_delete, sender=Barber)
+@receiver(post_delete, sender=Haircut)
+@receiver(post_delete, sender=Reservation)
+def log_synced_delete(sender, instance, **kwargs):
+    log_change(instance, 'delete')
+
+
+# Mapas de bits de turnos reservados (ReservationDay)
+@receiver(pre_save, sender=Reservation)
+def remember_previous_reservation(sender, instance, **kwargs):
+    instance._slot_previous = None
+    if instance.pk:
+        instance._slot_previous = (
+            Reservation.objects.filter(pk=instance.pk, is_active=True)
+            .values('barbershop_id', 'date', 'time').first()
+        )
+
+
+@receiver(post_save, sender=Reservation)
+def update_reservation_day_on_save(sender, instance, **kwargs):
+    previous = getattr(instance, '_slot_previous', None)
+    current = None
+    if instance.is_active:
+        current = {'barbershop_id': instance.barbershop_id, 'date': instance.date, 'time': instance.time}
+    if previous == current:
+        return
+    if previous:
+        mark_slot(previous['barbershop_id'], previous['date'], previous['time'], booked=False)
+    if current:
+        mark_slot(current['barbershop_id'], current['date'], current['time'])
+
+
+@receiver(post_delete, sender=Reservation)
+def update_reservation_day_on_delete(sender, instance, **kwargs):
+    if instance.is_active:
+        mark_slot(instance.barbershop_id, instance.date, instance.time, booked=False)
@@ -0,0 +1,114 @@
+# core/stats.py
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .cache import invalidate_cache, invalidate_cache_on_commit
+from .models import Barbershop, Haircut, HaircutDailyStats
+
+
+def apply_haircut_delta(barbershop_id, barber_id, payment_method, date, cuts, amount, create=True):
+    """
+    Suma (o resta) cortes y monto a la fila del acumulado diario.
+
+    Con create=False nunca se crea la fila: al borrar en cascada un barbero o
+    una barbería sus acumulados ya pueden haber desaparecido. La caché de la
+    barbería se invalida después de escribir el acumulado, no antes.
+    """
+    lookup = {
+        'barbershop_id': barbershop_id,
+        'barber_id': barber_id,
+        'payment_method': payment_method,
+        'date': date,
+    }
+    changes = {
+        'cut_count': F('cut_count') + cuts,
+        'total_amount': F('total_amount') + amount,
+        'updated_at': timezone.now(),
+    }
+    if not HaircutDailyStats.objects.filter(**lookup).update(**changes) and create:
+        try:
+            with transaction.atomic():
+                HaircutDailyStats.objects.create(cut_count=cuts, total_amount=amount, **lookup)
+        except IntegrityError:
+            # Otra request creó la fila al mismo tiempo
+            HaircutDailyStats.objects.filter(**lookup).update(**changes)
+    # Fuera de una transacción se ejecuta ya, con el acumulado escrito
+    invalidate_cache_on_commit(barbershop_id=barbershop_id)
+
+
+def apply_haircut_rows(haircuts, sign=1):
+    # Para altas (y con sign=-1 bajas) masivas que no disparan señales: una
+    # actualización por cada combinación barbero/método/día en lugar de una por corte
+    deltas = {}
+    for haircut in haircuts:
+        key = haircut_stats_key(vars(haircut))
+        cuts, amount = deltas.get(key, (0, 0))
+        deltas[key] = (cuts + sign, amount + sign * haircut.amount)
+    for key, (cuts, amount) in deltas.items():
+        apply_haircut_delta(*key, cuts, amount, create=sign > 0)
+
+
+def subtract_haircut_stats(haircuts):
+    """
+    Descuenta de los acumulados los cortes del queryset antes de borrarlos.
+    Una sola actualización con subconsultas, sin importar cuántos barberos o
+    días abarquen.
+    """
+    matching = (
+        haircuts
+        .filter(
+            barbershop_id=OuterRef('barbershop_id'),
+            barber_id=OuterRef('barber_id'),
+            payment_method=OuterRef('payment_method'),
+            business_date=OuterRef('date'),
+        )
+        .order_by()
+        .values('barber_id')
+    )
+    return HaircutDailyStats.objects.filter(Exists(matching)).update(
+        cut_count=F('cut_count') - Subquery(matching.annotate(cuts=Count('id')).values('cuts'),
+                                            output_field=IntegerField()),
+        total_amount=F('total_amount') - Subquery(matching.annotate(amount=Sum('amount')).values('amount')),
+        updated_at=timezone.now(),
+    )
+
+
+def haircut_stats_key(values):
+    return (
+        values['barbershop_id'],
+        values['barber_id'],
+        values['payment_method'],
+        values['business_date'],
+    )
+
+
+def rebuild_haircut_stats(barbershop_id=None):
+    """Recalcula los acumulados desde cero; devuelve cuántas filas generó."""
+    haircuts = Haircut.objects.all()
+    stats = HaircutDailyStats.objects.all()
+    if barbershop_id is not None:
+        haircuts = haircuts.filter(barbershop_id=barbershop_id)
+        stats = stats.filter(barbershop_id=barbershop_id)
+
+    rows = (
+        haircuts
+        .values('barbershop_id', 'barber_id', 'payment_method', date=F('business_date'))
+        .annotate(cut_count=Count('id'), total_amount=Sum('amount'))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        stats.delete()
+        created = HaircutDailyStats.objects.bulk_create(
+            (HaircutDailyStats(**row) for row in rows.iterator()),
+            batch_size=1000,
+        )
+
+    # Lo cacheado se calculó con los acumulados anteriores
+    barbershop_ids = [barbershop_id] if barbershop_id is not None else (
+        Barbershop.objects.values_list('id', flat=True)
+    )
+    for shop_id in barbershop_ids:
+        invalidate_cache(barbershop_id=shop_id)
+    return len(created)
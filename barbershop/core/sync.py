@@ -0,0 +1,115 @@
+# core/sync.py
+from django.conf import settings
+from django.db.models import Max
+
+from .cache import invalidate_cache_on_commit
+from .models import Barber, ChangeLog, Haircut, Reservation
+from .serializers import BarberSerializer, HaircutSerializer, ReservationSerializer
+
+# Modelos que se sincronizan: nombre en el registro -> (queryset, serializer, clave de respuesta)
+SYNCED_MODELS = {
+    'barber': (Barber.objects.all(), BarberSerializer, 'barbers'),
+    'haircut': (Haircut.objects.select_related('barber'), HaircutSerializer, 'haircuts'),
+    'reservation': (Reservation.objects.all(), ReservationSerializer, 'reservations'),
+}
+
+
+def log_change(instance, action):
+    ChangeLog.objects.create(
+        barbershop_id=instance.barbershop_id,
+        model=instance._meta.model_name,
+        object_id=instance.pk,
+        action=action,
+    )
+
+
+def log_changes(barbershop_id, model_name, object_ids, action):
+    # Para operaciones masivas que no disparan señales (bulk_create, borrado
+    # por lotes): también invalida lo que las señales invalidarían, al
+    # confirmar la transacción del llamador
+    invalidate_cache_on_commit(barbershop_id=barbershop_id)
+    ChangeLog.objects.bulk_create(
+        [
+            ChangeLog(barbershop_id=barbershop_id, model=model_name, object_id=object_id, action=action)
+            for object_id in object_ids
+        ],
+        batch_size=1000,
+    )
+
+
+def current_cursor(barbershop_id):
+    return ChangeLog.objects.filter(barbershop_id=barbershop_id).aggregate(cursor=Max('id'))['cursor'] or 0
+
+
+async def acurrent_cursor(barbershop_id):
+    cursor = await ChangeLog.objects.filter(barbershop_id=barbershop_id).aaggregate(cursor=Max('id'))
+    return cursor['cursor'] or 0
+
+
+def _is_tombstone(model_name, obj):
+    # Las reservas canceladas desaparecen de la lista igual que las borradas
+    return model_name == 'reservation' and not obj.is_active
+
+
+def _empty_payload(cursor):
+    payload = {'cursor': cursor, 'has_more': False, 'deleted': {}}
+    for _, _, key in SYNCED_MODELS.values():
+        payload[key] = []
+        payload['deleted'][key] = []
+    return payload
+
+
+def _serialize(payload, model_name, objects, context):
+    queryset, serializer_class, key = SYNCED_MODELS[model_name]
+    live = []
+    for obj in objects:
+        if _is_tombstone(model_name, obj):
+            payload['deleted'][key].append(obj.pk)
+        else:
+            live.append(obj)
+    payload[key] = serializer_class(live, many=True, context=context).data
+
+
+def snapshot(barbershop_id, context):
+    """Estado completo actual y el cursor desde el que seguir sincronizando."""
+    # El cursor se toma antes de leer: lo que cambie entre medio llegará
+    # otra vez en la siguiente sincronización (aplicar un upsert es idempotente)
+    payload = _empty_payload(current_cursor(barbershop_id))
+    for model_name, (queryset, _, _) in SYNCED_MODELS.items():
+        objects = queryset.filter(barbershop_id=barbershop_id)
+        if model_name == 'reservation':
+            objects = objects.filter(is_active=True)
+        _serialize(payload, model_name, objects, context)
+    return payload
+
+
+def changes_since(barbershop_id, since, context, limit=None):
+    """
+    Filas creadas, modificadas o borradas después del cursor `since`, hasta
+    `limit` entradas del registro. Si un objeto cambió varias veces solo
+    cuenta su última acción.
+    """
+    limit = limit or settings.SYNC_PAGE_SIZE
+    entries = list(
+        ChangeLog.objects.filter(barbershop_id=barbershop_id, id__gt=since)
+        .order_by('id')
+        .values_list('id', 'model', 'object_id', 'action')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    payload = _empty_payload(entries[-1][0] if entries else since)
+    payload['has_more'] = has_more
+
+    latest = {}
+    for _, model_name, object_id, action in entries:
+        latest[(model_name, object_id)] = action
+
+    for model_name, (queryset, _, key) in SYNCED_MODELS.items():
+        upserts = {oid for (name, oid), action in latest.items() if name == model_name and action == 'upsert'}
+        deletes = sorted(oid for (name, oid), action in latest.items() if name == model_name and action == 'delete')
+        objects = queryset.filter(barbershop_id=barbershop_id, id__in=upserts) if upserts else []
+        _serialize(payload, model_name, objects, context)
+        payload['deleted'][key].extend(deletes)
+
+    return payload
@@ -0,0 +1,33 @@
+# core/tasks.py
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+    thread_name_prefix='core-task',
+)
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Error en tarea en segundo plano %s', func.__name__)
+    finally:
+        # Cada hilo abre su propia conexión; cerrarla al terminar la tarea
+        connection.close()
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    Ejecuta func fuera del ciclo de la request, en un hilo del proceso.
+    Con BACKGROUND_TASKS_EAGER=True se ejecuta en el acto (útil en tests).
+    """
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        return func(*args, **kwargs)
+    return _executor.submit(_run, func, args, kwargs)
@@ -0,0 +1,44 @@
+# core/tenancy.py
+from rest_framework import serializers
+
+
+def get_request_barbershop_id(request):
+    """
+    Id de la barbería de la request. Lo resuelve LicenseMiddleware una sola
+    vez (desde los claims del token o la caché de licencias), así que leerlo
+    no ejecuta consultas.
+    """
+    barbershop_id = getattr(request, 'barbershop_id', None)
+    if barbershop_id is None:
+        raise serializers.ValidationError(
+            {"error": "No se encontró una barbería asociada a este usuario"}
+        )
+    return barbershop_id
+
+
+def get_request_barbershop(request):
+    # En el camino por claims es un objeto perezoso: se consulta al usarlo
+    get_request_barbershop_id(request)
+    return request.barbershop
+
+
+class TenantViewSetMixin:
+    """
+    Limita el queryset a la barbería de la request filtrando directamente por
+    barbershop_id (sin JOIN con el dueño) y la asigna en las altas.
+    """
+
+    @property
+    def barbershop_id(self):
+        return get_request_barbershop_id(self.request)
+
+    @property
+    def barbershop(self):
+        # Objeto completo solo cuando hace falta (p. ej. horario de atención)
+        return get_request_barbershop(self.request)
+
+    def get_queryset(self):
+        return super().get_queryset().filter(barbershop_id=self.barbershop_id)
+
+    def perform_create(self, serializer):
+        serializer.save(barbershop_id=self.barbershop_id)
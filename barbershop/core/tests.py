@@ -1,3 +1,1156 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import subprocess
+import tempfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import metrics
+from .availability import rebuild_reservation_days
+from .cache import (
+    get_license_revision, get_license_state, invalidate_tenant_cache, license_cache_stats, set_license_revision,
+    tenant_version,
+)
+from .deletions import _delete_batch, run_deletion_job, start_deletion_job
+from .models import (
+    Barber, Barbershop, ChangeLog, Haircut, HaircutDailyStats, HaircutDeletionJob, License, Reservation,
+    ReservationDay,
+)
+from .profiling import profiling_requested
+from .serializers import HaircutSerializer
+from .stats import apply_haircut_delta, rebuild_haircut_stats
+
+
+class LicensedTestCase(TestCase):
+    """Dueño con su licencia activada en la máquina M1 y la sesión iniciada."""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner', password='pw')
+        self.license = License.objects.create(expires_at=timezone.now() + timedelta(days=30))
+        self.client.post(
+            '/api/license/activate/',
+            {'license_key': str(self.license.key), 'machine_id': 'M1'},
+            content_type='application/json',
+        )
+        response = self.login()
+        self.headers = {
+            'HTTP_AUTHORIZATION': f"Bearer {response.json()['access']}",
+            'HTTP_X_MACHINE_ID': 'M1',
+        }
+        self.barbershop = Barbershop.objects.get(owner=self.owner)
+
+    def login(self):
+        return self.client.post(
+            '/api/auth/login/',
+            {'username': 'owner', 'password': 'pw'},
+            content_type='application/json',
+            HTTP_X_MACHINE_ID='M1',
+        )
+
+    def assertRollupsMatchRebuild(self):
+        # Los acumulados mantenidos al vuelo deben ser los que da el recálculo
+        def rollups():
+            return sorted(
+                HaircutDailyStats.objects.filter(barbershop=self.barbershop).exclude(cut_count=0)
+                .values_list('barber_id', 'payment_method', 'date', 'cut_count', 'total_amount')
+            )
+        maintained = rollups()
+        rebuild_haircut_stats(self.barbershop.id)
+        self.assertEqual(maintained, rollups())
+
+
+class HaircutListQueryTests(LicensedTestCase):
+    """El listado de cortes ejecuta las mismas consultas con 1 o con 50 cortes."""
+
+    def add_haircuts(self, count):
+        for i in range(count):
+            barber = Barber.objects.create(barbershop=self.barbershop, name=f'Barbero {i}')
+            Haircut.objects.create(
+                barbershop=self.barbershop, barber=barber,
+                client_name=f'Cliente {i}', payment_method='CASH', amount='25.50',
+            )
+
+    def list_haircuts(self, path='/api/haircuts/'):
+        # La primera request carga la licencia en caché; la que se mide no
+        self.client.get(path, **self.headers)
+        # Consulta del ETag + la del listado
+        with self.assertNumQueries(2):
+            response = self.client.get(path, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_query_count_is_constant(self):
+        self.add_haircuts(1)
+        self.assertEqual(len(self.list_haircuts()), 1)
+
+        self.add_haircuts(49)
+        self.assertEqual(len(self.list_haircuts()), 50)
+
+    def test_paginated_query_count_is_constant(self):
+        self.add_haircuts(30)
+        data = self.list_haircuts('/api/haircuts/?page_size=20')
+        self.assertEqual(len(data['results']), 20)
+
+    def test_matches_serializer_output(self):
+        self.add_haircuts(3)
+        expected = HaircutSerializer(Haircut.objects.all(), many=True).data
+        data = self.list_haircuts()
+        self.assertEqual(
+            sorted(data, key=lambda row: row['id']),
+            sorted(expected, key=lambda row: row['id']),
+        )
+
+
+class KeysetPaginationTests(LicensedTestCase):
+    """El cursor guarda todas las columnas del orden: los empates no usan OFFSET."""
+
+    def walk(self, path):
+        rows, sql = [], []
+        while path:
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get(path, **self.headers).json()
+            sql += [query['sql'] for query in queries.captured_queries]
+            rows += data['results']
+            path = data['next']
+        self.assertFalse(any('OFFSET' in query for query in sql))
+        return rows, data
+
+    def test_haircuts_with_the_same_created_at(self):
+        barber = Barber.objects.create(barbershop=self.barbershop, name='Barbero')
+        for i in range(23):
+            Haircut.objects.create(barbershop=self.barbershop, barber=barber, payment_method='CASH', amount='10')
+        Haircut.objects.update(created_at=timezone.now())
+
+        rows, last = self.walk('/api/haircuts/?page_size=5')
+        expected = list(Haircut.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual([row['id'] for row in rows], expected)
+
+        # Y hacia atrás desde la última página
+        previous = self.client.get(last['previous'], **self.headers).json()
+        self.assertEqual([row['id'] for row in previous['results']], expected[-8:-3])
+
+    def test_reservations_on_the_same_date(self):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        for i in range(17):
+            Reservation.objects.create(
+                barbershop=self.barbershop, client_name=f'Cliente {i}',
+                date=tomorrow + timedelta(days=i % 2), time=time(9 + i // 2, 30 * (i % 2)),
+            )
+        rows, _ = self.walk('/api/reservations/?page_size=4')
+        expected = list(Reservation.objects.order_by('date', 'time', 'id').values_list('id', flat=True))
+        self.assertEqual([row['id'] for row in rows], expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/reservations/?cursor=no-es-un-cursor', **self.headers)
+        self.assertEqual(response.status_code, 404)
+
+
+class ETagTests(LicensedTestCase):
+    """Un sondeo sin cambios recibe 304; cualquier cambio de datos lo invalida."""
+
+    def setUp(self):
+        super().setUp()
+        self.barber = Barber.objects.create(barbershop=self.barbershop, name='Barbero')
+
+    def poll(self, path, etag):
+        return self.client.get(path, HTTP_IF_NONE_MATCH=etag, **self.headers)
+
+    def test_not_modified_until_a_write(self):
+        path = '/api/haircuts/'
+        etag = self.client.get(path, **self.headers)['ETag']
+        self.assertEqual(self.poll(path, etag).status_code, 304)
+
+        self.client.post(path, {'barber': self.barber.id, 'payment_method': 'CASH', 'amount': '20.00'},
+                         content_type='application/json', **self.headers)
+        response = self.poll(path, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+
+    def test_rebuilding_rollups_changes_the_balance_etag(self):
+        # El recálculo no escribe en el registro de cambios
+        path = '/api/haircuts/balance/?period=daily'
+        Haircut.objects.bulk_create([Haircut(
+            barbershop=self.barbershop, barber=self.barber, payment_method='CASH',
+            amount='15.00', business_date=timezone.localdate(),
+        )])
+        response = self.client.get(path, **self.headers)
+        self.assertEqual(response.json()['dailyStats']['totalCuts'], 0)
+
+        rebuild_haircut_stats(self.barbershop.id)
+        response = self.poll(path, response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['dailyStats']['totalCuts'], 1)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, HAIRCUT_DELETE_BATCH_SIZE=4)
+class DeletionJobTests(LicensedTestCase):
+    """delete_all por lotes: archivo previo, acumulados y reanudación."""
+
+    def setUp(self):
+        super().setUp()
+        barber = Barber.objects.create(barbershop=self.barbershop, name='Barbero')
+        for amount in ('10.00', '12.50', '20.00', '15.00', '30.00', '8.00', '25.00', '40.00', '9.50', '11.00'):
+            Haircut.objects.create(barbershop=self.barbershop, barber=barber, payment_method='CASH', amount=amount)
+        self.archives = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archives.cleanup)
+
+    def assertEverythingDeleted(self):
+        self.assertFalse(Haircut.objects.exists())
+        self.assertFalse(HaircutDailyStats.objects.exclude(cut_count=0).exists())
+        self.assertEqual(ChangeLog.objects.filter(model='haircut', action='delete').count(), 10)
+
+    def test_archive_then_delete(self):
+        with override_settings(ARCHIVES_ROOT=self.archives.name):
+            response = self.client.delete('/api/haircuts/delete_all/?archive=1', **self.headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['deleted_count'], 10)
+
+            response = self.client.get('/api/haircuts/delete_all/archive/', **self.headers)
+            lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 11)  # cabecera + 10 cortes
+        self.assertEverythingDeleted()
+
+    def test_stale_job_resumes_from_status(self):
+        # Un worker que murió tras borrar el primer lote
+        job, _ = start_deletion_job(self.barbershop.id)
+        HaircutDeletionJob.objects.filter(pk=job.pk).update(status='deleting')
+        job.refresh_from_db()
+        _delete_batch(job)
+        HaircutDeletionJob.objects.filter(pk=job.pk).update(
+            updated_at=timezone.now() - timedelta(seconds=settings.DELETION_JOB_STALE_SECONDS + 1)
+        )
+        self.assertEqual(Haircut.objects.count(), 6)
+
+        self.client.get('/api/haircuts/delete_all/status/', **self.headers)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.deleted), ('done', 10))
+        self.assertEverythingDeleted()
+
+    def test_missing_archive_is_gone(self):
+        with override_settings(ARCHIVES_ROOT=self.archives.name):
+            self.client.delete('/api/haircuts/delete_all/?archive=1', **self.headers)
+        os.remove(HaircutDeletionJob.objects.get().archive_path)
+        response = self.client.get('/api/haircuts/delete_all/archive/', **self.headers)
+        self.assertEqual(response.status_code, 410)
+
+    def test_resume_command_skips_a_failing_job(self):
+        other = Barbershop.objects.create(
+            name='Otra', owner=User.objects.create_user('other', password='pw'),
+            license=License.objects.create(expires_at=timezone.now() + timedelta(days=30)),
+        )
+        Haircut.objects.create(
+            barbershop=other, barber=Barber.objects.create(barbershop=other, name='Barbero'),
+            payment_method='CASH', amount='10.00',
+        )
+        broken, _ = start_deletion_job(self.barbershop.id)
+        start_deletion_job(other.id)
+        HaircutDeletionJob.objects.update(
+            updated_at=timezone.now() - timedelta(seconds=settings.DELETION_JOB_STALE_SECONDS + 1)
+        )
+
+        def run(job_id):
+            if job_id == broken.id:
+                raise RuntimeError('disco lleno')
+            return run_deletion_job(job_id)
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with mock.patch('core.management.commands.resume_deletion_jobs.run_deletion_job', side_effect=run):
+            with self.assertLogs('core.management.commands.resume_deletion_jobs', 'ERROR'):
+                call_command('resume_deletion_jobs', stdout=stdout, stderr=stderr)
+        self.assertIn('Se retomaron 1 eliminaciones', stdout.getvalue())
+        self.assertIn('Fallaron 1 eliminaciones', stderr.getvalue())
+        self.assertFalse(Haircut.objects.filter(barbershop=other).exists())
+
+    def test_recent_job_is_not_resumed(self):
+        job, _ = start_deletion_job(self.barbershop.id)
+        response = self.client.get('/api/haircuts/delete_all/status/', **self.headers)
+        self.assertEqual(response.json()['status'], 'pending')
+        self.assertEqual(Haircut.objects.count(), 10)
+
+
+class AsyncViewTests(LicensedTestCase):
+    """Las lecturas async responden lo mismo que las de DRF, paginación incluida."""
+
+    def setUp(self):
+        super().setUp()
+        barber = Barber.objects.create(barbershop=self.barbershop, name='Barbero')
+        for i in range(7):
+            Haircut.objects.create(barbershop=self.barbershop, barber=barber, payment_method='CASH', amount='10')
+        self.async_headers = {'Authorization': self.headers['HTTP_AUTHORIZATION'], 'X-Machine-ID': 'M1'}
+        # Deja la huella de la licencia en caché para el camino por claims
+        self.client.get('/api/barbers/', **self.headers)
+
+    async def test_paginated_haircuts_match_drf(self):
+        path = '?page_size=3'
+        while path:
+            expected = (await self.async_client.get(f'/api/haircuts/{path}', headers=self.async_headers)).json()
+            data = (await self.async_client.get(f'/api/async/haircuts/{path}', headers=self.async_headers)).json()
+            self.assertEqual(data['results'], expected['results'])
+            self.assertEqual(data['next'] is None, expected['next'] is None)
+            path = data['next'] and '?' + data['next'].split('?', 1)[1]
+
+    async def test_csv_export_matches_drf(self):
+        today = timezone.localdate()
+        path = f'report/?startDate={today}&endDate={today}&format=csv'
+        with mock.patch('core.exports.EXPORT_CHUNK_SIZE', 3):
+            expected = await self.async_client.get(f'/api/haircuts/{path}', headers=self.async_headers)
+            response = await self.async_client.get(f'/api/async/haircuts/{path}', headers=self.async_headers)
+            data = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(data, await sync_to_async(b''.join)(expected.streaming_content))
+        self.assertEqual(len(data.decode().splitlines()), 8)
+
+    async def test_claims_path_uses_the_async_cache_api(self):
+        # Un cache.get síncrono en el event loop bloquearía con redis o archivos
+        with mock.patch('core.middleware.get_license_revision', side_effect=AssertionError):
+            response = await self.async_client.get('/api/async/reservations/', headers=self.async_headers)
+        self.assertEqual(response.status_code, 200)
+
+
+class MetricsStoreTests(TestCase):
+    """render_prometheus suma los workers vivos y descarta los que terminaron."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(METRICS_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def write_worker(self, pid, count):
+        snapshot = {'histograms': [], 'counters': [['barbershop_license_rejections_total', [['code', 'X']], count]]}
+        with open(os.path.join(self.directory, f'metrics_{pid}_1.json'), 'w') as output:
+            json.dump(snapshot, output)
+
+    def test_dead_workers_are_pruned(self):
+        finished = subprocess.Popen(['true'])
+        finished.wait()
+        self.write_worker(os.getppid(), 2)
+        self.write_worker(finished.pid, 5)
+
+        text = metrics.render_prometheus()
+        self.assertIn('barbershop_license_rejections_total{code="X"} 2', text)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, f'metrics_{finished.pid}_1.json')))
+
+
+class ProfilingFlagTests(TestCase):
+    def test_only_an_explicit_flag_turns_profiling_on(self):
+        factory = RequestFactory()
+        cases = {
+            '/api/haircuts/?_profile=1': True,
+            '/api/haircuts/?page=2&_profile=true': True,
+            '/api/haircuts/?_profile=0': False,
+            '/api/haircuts/?x_profile=1': False,
+            '/api/haircuts/?user_profile=': False,
+            '/api/haircuts/': False,
+        }
+        for path, expected in cases.items():
+            with self.subTest(path=path):
+                self.assertIs(profiling_requested(factory.get(path)), expected)
+        self.assertTrue(profiling_requested(factory.get('/api/haircuts/', HTTP_X_PROFILE='1')))
+        self.assertFalse(profiling_requested(factory.get('/api/haircuts/', HTTP_X_PROFILE='0')))
+
+
+class LicenseCacheTests(LicensedTestCase):
+    """El estado de licencia se cachea por usuario y máquina hasta que cambia."""
+
+    def test_second_lookup_is_a_hit(self):
+        cache.clear()
+        before = license_cache_stats()
+        get_license_state(self.owner.id, 'M1')
+        with self.assertNumQueries(0):
+            state = get_license_state(self.owner.id, 'M1')
+        self.assertEqual(state['barbershop'].license.machine_id, 'M1')
+
+        after = license_cache_stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+    def test_license_change_invalidates_the_state(self):
+        self.assertEqual(self.client.get('/api/barbers/', **self.headers).status_code, 200)
+        self.license.is_active = False
+        self.license.save()
+        response = self.client.get('/api/barbers/', **self.headers)
+        self.assertEqual(response.json()['code'], 'INACTIVE_LICENSE')
+
+    def test_barbershop_change_invalidates_the_state(self):
+        self.client.get('/api/barbers/', **self.headers)
+        self.barbershop.license = License.objects.create(
+            machine_id='M2', expires_at=timezone.now() + timedelta(days=30)
+        )
+        self.barbershop.save()
+        self.assertEqual(get_license_state(self.owner.id, 'M1')['barbershop'].license.machine_id, 'M2')
+        response = self.client.get('/api/barbers/', **self.headers)
+        self.assertEqual(response.json()['code'], 'INVALID_MACHINE')
+
+
+class LicenseClaimsTests(LicensedTestCase):
+    """Los claims `lic` del token autorizan sin consultas mientras la huella coincida."""
+
+    def claims(self, access=None):
+        access = access or self.headers['HTTP_AUTHORIZATION'].split()[1]
+        return jwt.decode(access, settings.SECRET_KEY, algorithms=['HS256'])['lic']
+
+    def test_token_carries_the_license(self):
+        claims = self.claims()
+        self.assertEqual(claims['bid'], self.barbershop.id)
+        self.assertEqual(claims['lid'], self.license.id)
+        self.assertEqual(claims['mid'], 'M1')
+
+    def test_claims_path_skips_the_license_state(self):
+        self.client.get('/api/barbers/', **self.headers)
+        self.assertEqual(get_license_revision(self.owner.id), self.claims()['rev'])
+        with mock.patch('core.middleware.get_license_state', side_effect=AssertionError):
+            response = self.client.get('/api/barbers/', **self.headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_revision_takes_the_full_path(self):
+        set_license_revision(self.owner.id, 'otra-huella')
+        with mock.patch('core.middleware.get_license_state', wraps=get_license_state) as lookup:
+            response = self.client.get('/api/barbers/', **self.headers)
+        self.assertEqual(response.status_code, 200)
+        lookup.assert_called_once()
+        self.assertNotEqual(get_license_revision(self.owner.id), 'otra-huella')
+
+    def test_license_change_rejects_old_claims(self):
+        self.client.get('/api/barbers/', **self.headers)
+        self.license.expires_at = timezone.now() - timedelta(minutes=1)
+        self.license.save()
+        response = self.client.get('/api/barbers/', **self.headers)
+        self.assertEqual(response.json()['code'], 'EXPIRED_LICENSE')
+
+    def test_refresh_keeps_the_claims(self):
+        tokens = self.login().json()
+        response = self.client.post(
+            '/api/auth/refresh/', {'refresh': tokens['refresh']}, content_type='application/json'
+        )
+        access = response.json()['access']
+        self.assertEqual(self.claims(access), self.claims(tokens['access']))
+
+        self.client.get('/api/barbers/', **self.headers)
+        self.headers['HTTP_AUTHORIZATION'] = f'Bearer {access}'
+        with mock.patch('core.middleware.get_license_state', side_effect=AssertionError):
+            response = self.client.get('/api/barbers/', **self.headers)
+        self.assertEqual(response.status_code, 200)
+
+
+class HaircutRollupTests(LicensedTestCase):
+    """Altas, cambios y bajas por la API mantienen los acumulados diarios al día."""
+
+    def setUp(self):
+        super().setUp()
+        self.barbers = [
+            Barber.objects.create(barbershop=self.barbershop, name=name) for name in ('Barbero 1', 'Barbero 2')
+        ]
+        self.ids = [
+            self.client.post(
+                '/api/haircuts/', {'barber': barber.id, 'payment_method': method, 'amount': amount},
+                content_type='application/json', **self.headers,
+            ).json()['id']
+            for barber, method, amount in (
+                (self.barbers[0], 'CASH', '20.00'),
+                (self.barbers[0], 'CASH', '25.00'),
+                (self.barbers[1], 'YAPE', '30.00'),
+            )
+        ]
+
+    def patch(self, haircut_id, data):
+        response = self.client.patch(
+            f'/api/haircuts/{haircut_id}/', data, content_type='application/json', **self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_create(self):
+        stats = HaircutDailyStats.objects.get(barber=self.barbers[0], payment_method='CASH')
+        self.assertEqual((stats.cut_count, str(stats.total_amount)), (2, '45.00'))
+        self.assertRollupsMatchRebuild()
+
+    def test_update_amount(self):
+        self.patch(self.ids[0], {'amount': '35.50'})
+        self.assertRollupsMatchRebuild()
+
+    def test_update_payment_method_and_barber(self):
+        self.patch(self.ids[1], {'payment_method': 'YAPE', 'barber': self.barbers[1].id})
+        self.assertRollupsMatchRebuild()
+
+    def test_balance_read_before_the_rollup_is_not_cached(self):
+        # Una lectura que llega entre la invalidación y el acumulado no debe
+        # quedar cacheada: la generación cambia después de escribirlo
+        path = '/api/haircuts/balance/?period=daily'
+
+        def stale_read(*args, **kwargs):
+            self.client.get(path, **self.headers)
+            apply_haircut_delta(*args, **kwargs)
+
+        with mock.patch('core.signals.apply_haircut_delta', side_effect=stale_read):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(
+                    '/api/haircuts/', {'barber': self.barbers[1].id, 'payment_method': 'CASH', 'amount': '100.00'},
+                    content_type='application/json', **self.headers,
+                )
+        self.assertEqual(self.client.get(path, **self.headers).json()['dailyStats']['totalCuts'], 4)
+
+    def test_delete(self):
+        for haircut_id in self.ids[1:]:
+            response = self.client.delete(f'/api/haircuts/{haircut_id}/', **self.headers)
+            self.assertEqual(response.status_code, 204)
+        self.assertRollupsMatchRebuild()
+        stats = HaircutDailyStats.objects.get(barber=self.barbers[0], payment_method='CASH')
+        self.assertEqual((stats.cut_count, str(stats.total_amount)), (1, '20.00'))
+
+
+class HaircutBulkTests(LicensedTestCase):
+    """Reenviar un lote con los mismos client_key no duplica cortes ni acumulados."""
+
+    def setUp(self):
+        super().setUp()
+        barber = Barber.objects.create(barbershop=self.barbershop, name='Barbero')
+        self.items = [
+            {'client_key': f'pc-{i}', 'barber': barber.id, 'payment_method': 'CASH', 'amount': '20.00'}
+            for i in range(3)
+        ]
+
+    def send(self, items):
+        return self.client.post(
+            '/api/haircuts/bulk/', {'haircuts': items}, content_type='application/json', **self.headers
+        )
+
+    def test_retry_reports_duplicates(self):
+        response = self.send(self.items)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()['created']), 3)
+
+        response = self.send(self.items + [dict(self.items[0], client_key='pc-3')])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['client_key'] for row in response.json()['created']], ['pc-3'])
+        self.assertEqual(response.json()['duplicates'], ['pc-0', 'pc-1', 'pc-2'])
+
+        self.assertEqual(Haircut.objects.count(), 4)
+        self.assertEqual(ChangeLog.objects.filter(model='haircut', action='upsert').count(), 4)
+        stats = HaircutDailyStats.objects.get(barbershop=self.barbershop)
+        self.assertEqual((stats.cut_count, str(stats.total_amount)), (4, '80.00'))
+        self.assertRollupsMatchRebuild()
+
+    def test_full_retry_creates_nothing(self):
+        self.send(self.items)
+        response = self.send(self.items)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], [])
+        self.assertEqual(Haircut.objects.count(), 3)
+
+    def test_cache_is_invalidated_after_commit(self):
+        # Antes de confirmar, una lectura concurrente cachearía el balance viejo
+        version = tenant_version(self.barbershop.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.send(self.items)
+            self.assertEqual(tenant_version(self.barbershop.id), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(tenant_version(self.barbershop.id), version)
+
+    def test_repeated_key_in_one_batch(self):
+        response = self.send(self.items + [self.items[0]])
+        self.assertEqual(response.json()['duplicates'], ['pc-0'])
+        self.assertEqual(Haircut.objects.count(), 3)
+
+    def test_foreign_barber_rejects_the_batch(self):
+        other = User.objects.create_user('other', password='pw')
+        shop = Barbershop.objects.create(
+            name='Otra', owner=other,
+            license=License.objects.create(expires_at=timezone.now() + timedelta(days=30)),
+        )
+        foreign = Barber.objects.create(barbershop=shop, name='Ajeno')
+        response = self.send(self.items + [dict(self.items[0], client_key='pc-3', barber=foreign.id)])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Haircut.objects.exists())
+
+
+class ChangesSyncTests(LicensedTestCase):
+    """/api/changes/: snapshot inicial y luego solo lo que cambió, bajas incluidas."""
+
+    def setUp(self):
+        super().setUp()
+        self.barber = Barber.objects.create(barbershop=self.barbershop, name='Barbero')
+        self.haircut = self.add_haircut()
+        self.reservation = Reservation.objects.create(
+            barbershop=self.barbershop, client_name='Cliente',
+            date=timezone.localdate() + timedelta(days=1), time=time(10, 0),
+        )
+
+    def add_haircut(self):
+        return Haircut.objects.create(
+            barbershop=self.barbershop, barber=self.barber, payment_method='CASH', amount='20.00'
+        )
+
+    def changes(self, since=None):
+        path = '/api/changes/' if since is None else f'/api/changes/?since={since}'
+        response = self.client.get(path, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_snapshot_then_changes(self):
+        snapshot = self.changes()
+        self.assertEqual([row['id'] for row in snapshot['haircuts']], [self.haircut.id])
+        self.assertEqual([row['id'] for row in snapshot['reservations']], [self.reservation.id])
+        self.assertEqual(self.changes(snapshot['cursor'])['haircuts'], [])
+
+        new = self.add_haircut()
+        self.client.delete(f'/api/haircuts/{self.haircut.id}/', **self.headers)
+        self.reservation.is_active = False
+        self.reservation.save()
+
+        changes = self.changes(snapshot['cursor'])
+        self.assertEqual([row['id'] for row in changes['haircuts']], [new.id])
+        self.assertEqual(changes['deleted']['haircuts'], [self.haircut.id])
+        self.assertEqual(changes['deleted']['reservations'], [self.reservation.id])
+        self.assertEqual(changes['reservations'], [])
+        self.assertGreater(changes['cursor'], snapshot['cursor'])
+
+    def test_created_then_deleted_is_only_a_delete(self):
+        cursor = self.changes()['cursor']
+        haircut_id = self.add_haircut().id
+        Haircut.objects.get(pk=haircut_id).delete()
+        changes = self.changes(cursor)
+        self.assertEqual(changes['haircuts'], [])
+        self.assertEqual(changes['deleted']['haircuts'], [haircut_id])
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_pages_until_caught_up(self):
+        cursor = self.changes()['cursor']
+        ids = [self.add_haircut().id for _ in range(5)]
+        seen, has_more = [], True
+        while has_more:
+            changes = self.changes(cursor)
+            seen += [row['id'] for row in changes['haircuts']]
+            cursor, has_more = changes['cursor'], changes['has_more']
+        self.assertEqual(sorted(seen), ids)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/changes/?since=abc', **self.headers)
+        self.assertEqual(response.status_code, 400)
+
+
+class ReservationDayTests(LicensedTestCase):
+    """Los mapas de bits de turnos siguen a las reservas al crearlas, moverlas y cancelarlas."""
+
+    def setUp(self):
+        super().setUp()
+        self.tomorrow = timezone.localdate() + timedelta(days=1)
+        response = self.client.post(
+            '/api/reservations/', {'client_name': 'Cliente', 'date': str(self.tomorrow), 'time': '10:00'},
+            content_type='application/json', **self.headers,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.reservation = Reservation.objects.get(pk=response.json()['id'])
+
+    def free(self, date):
+        response = self.client.get(
+            f'/api/reservations/availability/?startDate={date}&endDate={date}', **self.headers
+        )
+        return response.json()['days'][0]['free']
+
+    def assertBitmapsMatchRebuild(self):
+        def bitmaps():
+            return sorted(
+                ReservationDay.objects.filter(barbershop=self.barbershop).exclude(booked=0)
+                .values_list('date', 'booked')
+            )
+        maintained = bitmaps()
+        rebuild_reservation_days(self.barbershop.id)
+        self.assertEqual(maintained, bitmaps())
+
+    def test_booking_takes_the_slot(self):
+        self.assertNotIn('10:00', self.free(self.tomorrow))
+        self.assertIn('10:30', self.free(self.tomorrow))
+        self.assertBitmapsMatchRebuild()
+
+    def test_hours_off_the_grid(self):
+        for opening, closing, first, last in (
+            (time(9, 0), time(21, 0), '09:00', '20:30'),
+            (time(9, 15), time(20, 45), '09:30', '20:00'),
+            (time(8, 50), time(20, 59), '09:00', '20:00'),
+        ):
+            Barbershop.objects.filter(pk=self.barbershop.pk).update(opening_time=opening, closing_time=closing)
+            with self.subTest(opening=opening, closing=closing):
+                free = self.free(self.tomorrow)
+                self.assertEqual((free[0], free[-1]), (first, last))
+
+    def test_move_frees_the_old_slot(self):
+        later = self.tomorrow + timedelta(days=1)
+        response = self.client.patch(
+            f'/api/reservations/{self.reservation.id}/', {'date': str(later), 'time': '16:30'},
+            content_type='application/json', **self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('10:00', self.free(self.tomorrow))
+        self.assertNotIn('16:30', self.free(later))
+        self.assertBitmapsMatchRebuild()
+
+    def test_cancel_frees_the_slot(self):
+        self.reservation.is_active = False
+        self.reservation.save()
+        self.assertIn('10:00', self.free(self.tomorrow))
+        self.assertBitmapsMatchRebuild()
+
+    def test_delete_frees_the_slot(self):
+        response = self.client.delete(f'/api/reservations/{self.reservation.id}/', **self.headers)
+        self.assertEqual(response.status_code, 204)
+        self.assertIn('10:00', self.free(self.tomorrow))
+        self.assertBitmapsMatchRebuild()
+
+
+class ReservationBookingTests(LicensedTestCase):
+    """El índice único parcial decide qué reserva se queda con el turno."""
+
+    def setUp(self):
+        super().setUp()
+        self.tomorrow = timezone.localdate() + timedelta(days=1)
+
+    def book(self, time='10:00', date=None):
+        return self.client.post(
+            '/api/reservations/',
+            {'client_name': 'Cliente', 'date': str(date or self.tomorrow), 'time': time},
+            content_type='application/json', **self.headers,
+        )
+
+    def bulk(self, **data):
+        return self.client.post(
+            '/api/reservations/bulk/', dict(client_name='Fijo', **data),
+            content_type='application/json', **self.headers,
+        )
+
+    def test_taken_slot_is_rejected(self):
+        self.assertEqual(self.book().status_code, 201)
+        response = self.book()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('time', response.json())
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_insert_without_checking_first(self):
+        # Sin SELECT previo sobre las reservas: no hay ventana entre leer y escribir
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.book().status_code, 201)
+        reads = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and '"core_reservation"' in query['sql']
+        ]
+        self.assertEqual(reads, [])
+
+    def test_cancelled_slot_can_be_booked_again(self):
+        reservation = Reservation.objects.get(pk=self.book().json()['id'])
+        reservation.is_active = False
+        reservation.save()
+        self.assertEqual(self.book().status_code, 201)
+
+    def test_move_onto_a_taken_slot(self):
+        self.book()
+        moved = self.book('11:00').json()['id']
+        response = self.client.patch(
+            f'/api/reservations/{moved}/', {'date': str(self.tomorrow), 'time': '10:00'},
+            content_type='application/json', **self.headers,
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(str(Reservation.objects.get(pk=moved).time), '11:00:00')
+
+    def test_recurrence_skips_taken_slots(self):
+        self.book('17:00', self.tomorrow + timedelta(days=7))
+        response = self.bulk(recurrence={'start_date': str(self.tomorrow), 'time': '17:00', 'count': 3})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [result['status'] for result in response.json()['results']], ['created', 'conflict', 'created']
+        )
+        self.assertEqual(Reservation.objects.count(), 3)
+
+    def test_recurrence_out_of_range(self):
+        start = str(self.tomorrow)
+        for recurrence in (
+            {'start_date': start, 'count': 3, 'every_days': 10 ** 9},
+            {'start_date': start, 'count': 3000000},
+            {'start_date': '9999-12-15', 'count': 2, 'every_days': 30},
+        ):
+            with self.subTest(**recurrence):
+                response = self.bulk(recurrence=dict(recurrence, time='17:00'))
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_slots_take_the_shared_client_name(self):
+        response = self.bulk(details='Corte y barba', slots=[
+            {'date': str(self.tomorrow), 'time': '09:00'},
+            {'date': str(self.tomorrow), 'time': '09:30', 'client_name': 'Otro'},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            list(Reservation.objects.order_by('time').values_list('client_name', 'details')),
+            [('Fijo', 'Corte y barba'), ('Otro', 'Corte y barba')],
+        )
+
+    def test_all_or_nothing_rolls_back(self):
+        self.book('17:00', self.tomorrow + timedelta(days=7))
+        response = self.bulk(
+            recurrence={'start_date': str(self.tomorrow), 'time': '17:00', 'count': 3}, all_or_nothing=True
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            [result['status'] for result in response.json()['results']], ['rolled_back', 'conflict', 'rolled_back']
+        )
+        self.assertEqual(Reservation.objects.count(), 1)
+
+
+class HaircutExportTests(LicensedTestCase):
+    """Exportación CSV/NDJSON del reporte en streaming, solo con los cortes de la barbería."""
+
+    def setUp(self):
+        super().setUp()
+        barber = Barber.objects.create(barbershop=self.barbershop, name='Barbero')
+        for i in range(8):
+            Haircut.objects.create(
+                barbershop=self.barbershop, barber=barber, client_name=f'Cliente {i}',
+                payment_method='CASH' if i % 2 else 'YAPE', amount='20.00',
+            )
+        other = Barbershop.objects.create(
+            name='Otra', owner=User.objects.create_user('other', password='pw'),
+            license=License.objects.create(expires_at=timezone.now() + timedelta(days=30)),
+        )
+        Haircut.objects.create(
+            barbershop=other, barber=Barber.objects.create(barbershop=other, name='Ajeno'),
+            client_name='Ajeno', payment_method='CASH', amount='99.00',
+        )
+        today = timezone.localdate()
+        self.path = f'/api/haircuts/report/?startDate={today}&endDate={today}'
+
+    def export(self, export_format):
+        with mock.patch('core.exports.EXPORT_CHUNK_SIZE', 3):
+            response = self.client.get(f'{self.path}&format={export_format}', **self.headers)
+            chunks = list(response.streaming_content)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return response, chunks
+
+    def test_csv(self):
+        response, chunks = self.export('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment;', response['Content-Disposition'])
+        # La primera línea sola y luego bloques de 3
+        self.assertGreater(len(chunks), 2)
+
+        rows = list(csv.reader(b''.join(chunks).decode().splitlines()))
+        self.assertEqual(rows[0], ['id', 'fecha', 'cliente', 'barbero', 'metodo_pago', 'monto'])
+        self.assertEqual(len(rows), 9)
+        expected = Haircut.objects.filter(barbershop=self.barbershop).order_by('created_at', 'id')
+        self.assertEqual([int(row[0]) for row in rows[1:]], list(expected.values_list('id', flat=True)))
+
+    def test_ndjson(self):
+        response, chunks = self.export('ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+        self.assertEqual(len(rows), 8)
+        self.assertEqual({row['barbero'] for row in rows}, {'Barbero'})
+        self.assertEqual(rows[0]['monto'], '20.00')
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class ReportPdfTests(LicensedTestCase):
+    """El PDF se genera una vez por versión de los datos y luego se sirve del disco."""
+
+    def setUp(self):
+        super().setUp()
+        self.barber = Barber.objects.create(barbershop=self.barbershop, name='Barbero')
+        self.add_haircut()
+        today = timezone.localdate()
+        self.path = f'/api/haircuts/report_pdf/?startDate={today}&endDate={today}'
+        reports = tempfile.TemporaryDirectory()
+        self.addCleanup(reports.cleanup)
+        self.reports_root = reports.name
+        reports_setting = override_settings(REPORTS_ROOT=reports.name)
+        reports_setting.enable()
+        self.addCleanup(reports_setting.disable)
+
+    def add_haircut(self):
+        Haircut.objects.create(
+            barbershop=self.barbershop, barber=self.barber, payment_method='CASH', amount='20.00'
+        )
+
+    def get(self):
+        return self.client.get(self.path, **self.headers)
+
+    def pdfs(self):
+        return [name for _, _, names in os.walk(self.reports_root) for name in names]
+
+    def test_pending_then_ready(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Retry-After'], '2')
+
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+    def test_second_request_reads_the_file(self):
+        self.get()
+        with mock.patch('core.reports.build_report_pdf') as build:
+            self.assertEqual(self.get().status_code, 200)
+            self.assertEqual(self.get().status_code, 200)
+        build.assert_not_called()
+
+    def test_haircut_write_regenerates(self):
+        self.get()
+        first = self.pdfs()
+        self.add_haircut()
+        self.assertEqual(self.get().status_code, 202)
+        self.assertEqual(self.get().status_code, 200)
+        # La versión anterior del mismo rango se borra
+        self.assertEqual(len(self.pdfs()), 1)
+        self.assertNotEqual(self.pdfs(), first)
+
+
+class HaircutAnalyticsTests(LicensedTestCase):
+    """Analítica por barbero, método de pago y horario; cacheada hasta el siguiente cambio."""
+
+    def setUp(self):
+        super().setUp()
+        self.ana = Barber.objects.create(barbershop=self.barbershop, name='Ana')
+        self.beto = Barber.objects.create(barbershop=self.barbershop, name='Beto')
+        # Lunes 2 y martes 3 de marzo, hora de Lima
+        self.haircuts = [
+            self.add_haircut(self.ana, 'CASH', '30.00', datetime(2026, 3, 2, 10, 15)),
+            self.add_haircut(self.ana, 'YAPE', '20.00', datetime(2026, 3, 2, 10, 45)),
+            self.add_haircut(self.beto, 'CASH', '25.00', datetime(2026, 3, 3, 15, 0)),
+        ]
+        self.path = f'/api/haircuts/analytics/?startDate=2026-03-01&endDate={timezone.localdate()}'
+
+    def add_haircut(self, barber, payment_method, amount, moment):
+        created_at = timezone.make_aware(moment)
+        haircut = Haircut.objects.create(
+            barbershop=self.barbershop, barber=barber, payment_method=payment_method,
+            amount=amount, business_date=created_at.date(),
+        )
+        Haircut.objects.filter(pk=haircut.pk).update(created_at=created_at)
+        return haircut
+
+    def analytics(self):
+        response = self.client.get(self.path, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_aggregates(self):
+        data = self.analytics()
+        totals = data['totals']
+        self.assertEqual(totals['cuts'], 3)
+        self.assertEqual(
+            [Decimal(totals[key]) for key in ('revenue', 'cashTotal', 'yapeTotal', 'averageTicket')],
+            [Decimal('75'), Decimal('55'), Decimal('20'), Decimal('25')],
+        )
+        self.assertEqual(totals['paymentMix'], {'CASH': 73.3, 'YAPE': 26.7})
+
+        ana, beto = data['barbers']
+        self.assertEqual((ana['name'], ana['rank'], ana['cuts']), ('Ana', 1, 2))
+        self.assertEqual(Decimal(ana['revenue']), Decimal('50'))
+        self.assertEqual((beto['name'], beto['rank'], beto['cuts']), ('Beto', 2, 1))
+        self.assertEqual(ana['hourly'][10], 2)
+        self.assertEqual(beto['weekday'][1], 1)
+
+        self.assertEqual(data['heatmap'][0][10], 2)
+        self.assertEqual(data['heatmap'][1][15], 1)
+        self.assertEqual(data['weekday'], [2, 1, 0, 0, 0, 0, 0])
+        self.assertEqual(sum(data['hourly']), 3)
+
+    def test_second_call_is_cached(self):
+        first = self.analytics()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.analytics(), first)
+
+    def test_haircut_writes_invalidate(self):
+        self.analytics()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                '/api/haircuts/', {'barber': self.beto.id, 'payment_method': 'YAPE', 'amount': '40.00'},
+                content_type='application/json', **self.headers,
+            )
+        data = self.analytics()
+        self.assertEqual(data['totals']['cuts'], 4)
+        self.assertEqual([barber['name'] for barber in data['barbers']], ['Beto', 'Ana'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/haircuts/{self.haircuts[0].id}/', **self.headers)
+        self.assertEqual(self.analytics()['totals']['cuts'], 3)
+
+
+class QueryBudgetTests(LicensedTestCase):
+    """
+    Consultas exactas de cada endpoint con 10 y con 10.000 filas: si una
+    consulta por fila (N+1) vuelve a aparecer, el conteo crece y falla.
+    """
+    SIZES = (10, 10000)
+
+    def setUp(self):
+        super().setUp()
+        self.rows = 0
+
+    def grow_to(self, count):
+        # Altas masivas sin señales: un barbero, un corte y una reserva por
+        # fila, repartidos en distintos días; los acumulados se recalculan
+        start, self.rows = self.rows, max(self.rows, count)
+        today = timezone.localdate()
+        barbers = Barber.objects.bulk_create([
+            Barber(barbershop=self.barbershop, name=f'Barbero {i}') for i in range(start, count)
+        ])
+        Haircut.objects.bulk_create([
+            Haircut(
+                barbershop=self.barbershop, barber=barber, client_name=f'Cliente {i}',
+                payment_method='CASH' if i % 3 else 'YAPE', amount='25.50',
+                business_date=today - timedelta(days=i % 28),
+            )
+            for i, barber in enumerate(barbers, start)
+        ])
+        Reservation.objects.bulk_create([
+            Reservation(
+                barbershop=self.barbershop, client_name=f'Cliente {i}',
+                date=today + timedelta(days=1 + i // 24), time=time(9 + i % 24 // 2, 30 * (i % 2)),
+            )
+            for i in range(start, count)
+        ])
+        rebuild_haircut_stats(self.barbershop.id)
+
+    def assertBudget(self, queries, path):
+        for rows in self.SIZES:
+            self.grow_to(rows)
+            with self.subTest(rows=rows):
+                # La primera request carga la licencia en caché; la que se mide no
+                self.client.get(path, **self.headers)
+                with self.assertNumQueries(queries):
+                    response = self.client.get(path, **self.headers)
+                self.assertEqual(response.status_code, 200)
+
+    def test_login(self):
+        for rows in self.SIZES:
+            self.grow_to(rows)
+            with self.subTest(rows=rows), self.assertNumQueries(7):
+                self.assertEqual(self.login().status_code, 200)
+
+    def test_license_activate(self):
+        for rows in self.SIZES:
+            self.grow_to(rows)
+            license = License.objects.create(expires_at=timezone.now() + timedelta(days=30))
+            with self.subTest(rows=rows), self.assertNumQueries(4):
+                response = self.client.post(
+                    '/api/license/activate/',
+                    {'license_key': str(license.key), 'machine_id': f'M-{rows}'},
+                    content_type='application/json',
+                )
+            self.assertEqual(response.status_code, 200)
+
+    def test_license_check_without_cache(self):
+        # Camino completo de LicenseMiddleware: el usuario y la barbería con su
+        # licencia unida (sin acceso perezoso a barbershop.license) + el listado
+        for rows in self.SIZES:
+            self.grow_to(rows)
+            cache.clear()
+            with self.subTest(rows=rows), self.assertNumQueries(3):
+                response = self.client.get('/api/barbers/', **self.headers)
+            self.assertEqual(response.status_code, 200)
+
+    def test_barbers(self):
+        self.assertBudget(1, '/api/barbers/')
+
+    def test_haircuts(self):
+        # Consulta del ETag + la del listado, con el nombre del barbero unido
+        self.assertBudget(2, '/api/haircuts/')
+
+    def test_reservations(self):
+        self.assertBudget(2, '/api/reservations/')
+
+    def test_balance_daily(self):
+        # Acumulados en caché: solo la consulta del ETag
+        self.assertBudget(1, '/api/haircuts/balance/?period=daily')
+
+    def test_balance_monthly(self):
+        self.assertBudget(1, '/api/haircuts/balance/?period=monthly')
+
+    def test_balance_without_cache(self):
+        # Caché de la barbería invalidada: ETag + una agregación de los acumulados
+        for rows in self.SIZES:
+            self.grow_to(rows)
+            self.client.get('/api/barbers/', **self.headers)
+            invalidate_tenant_cache(self.barbershop.id)
+            with self.subTest(rows=rows), self.assertNumQueries(2):
+                response = self.client.get('/api/haircuts/balance/?period=monthly', **self.headers)
+            self.assertEqual(response.status_code, 200)
+
+    def test_report(self):
+        today = timezone.localdate()
+        self.assertBudget(3, f'/api/haircuts/report/?startDate={today - timedelta(days=30)}&endDate={today}')
+
+    def test_delete_all(self):
+        # Un solo lote: se resuelve en la request
+        self.grow_to(10)
+        self.client.get('/api/barbers/', **self.headers)
+        with self.assertNumQueries(16):
+            response = self.client.delete('/api/haircuts/delete_all/', **self.headers)
+        self.assertEqual(response.json()['deleted_count'], 10)
+
+    @mock.patch('core.views.schedule_deletion_job')
+    def test_delete_all_in_background(self, schedule):
+        # Varios lotes: la request solo crea el trabajo
+        self.grow_to(10000)
+        self.client.get('/api/barbers/', **self.headers)
+        with self.assertNumQueries(4):
+            response = self.client.delete('/api/haircuts/delete_all/', **self.headers)
+        self.assertEqual(response.status_code, 202)
+        schedule.assert_called_once()
+
+    @override_settings(HAIRCUT_DELETE_BATCH_SIZE=100)
+    def test_deletion_job_batches(self):
+        # Cada lote cuesta lo mismo sin importar cuántos barberos y días
+        # abarque: 6 consultas fijas del trabajo + 7 por lote
+        for rows in self.SIZES:
+            self.grow_to(rows)
+            job, _ = start_deletion_job(self.barbershop.id)
+            with self.subTest(rows=rows), self.assertNumQueries(6 + 7 * -(-job.total // 100)):
+                run_deletion_job(job.id)
+            self.assertFalse(Haircut.objects.exists())
+
+
+class LicenseExpiryTests(LicensedTestCase):
+    """Las licencias vencidas las desactiva expire_licenses, no las requests."""
+
+    def setUp(self):
+        super().setUp()
+        # Vence sin pasar por las señales, como el simple paso del tiempo
+        License.objects.filter(pk=self.license.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+    def test_middleware_does_not_write(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/barbers/', **self.headers)
+        self.assertEqual(response.json()['code'], 'EXPIRED_LICENSE')
+        self.assertTrue(all(query['sql'].startswith('SELECT') for query in queries.captured_queries))
+        self.license.refresh_from_db()
+        self.assertTrue(self.license.is_active)
+
+    def test_command_deactivates_and_invalidates(self):
+        with CaptureQueriesContext(connection) as queries:
+            call_command('expire_licenses', stdout=io.StringIO())
+        updates = [query for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+
+        self.license.refresh_from_db()
+        self.assertFalse(self.license.is_active)
+        response = self.client.get('/api/barbers/', **self.headers)
+        self.assertEqual(response.json()['code'], 'INACTIVE_LICENSE')
@@ -2,7 +2,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from . import views
+from . import async_views, views
 from rest_framework.routers import DefaultRouter
 
 
@@ -15,5 +15,14 @@ urlpatterns = [
     path('auth/login/', views.CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('license/activate/', views.LicenseActivationView.as_view(), name='license_activate'),
+    path('license/cache-stats/', views.LicenseCacheStatsView.as_view(), name='license_cache_stats'),
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+    path('profiling/', views.ProfilingView.as_view(), name='profiling'),
+    path('changes/', views.ChangesView.as_view(), name='changes'),
+    # Lecturas async (ASGI): mismas respuestas que sus equivalentes de DRF
+    path('async/haircuts/', async_views.haircut_list, name='async_haircut_list'),
+    path('async/haircuts/balance/', async_views.haircut_balance, name='async_haircut_balance'),
+    path('async/haircuts/report/', async_views.haircut_report, name='async_haircut_report'),
+    path('async/reservations/', async_views.reservation_list, name='async_reservation_list'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -4,23 +4,53 @@ from django.db import models
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.settings import api_settings
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from rest_framework.authentication import SessionAuthentication
 from django.utils import timezone
 from django.db.models import Sum, Count, Q
-from .models import License, Barbershop, Barber, Haircut, Reservation
+from .models import (
+    License, Barbershop, Barber, Haircut, HaircutDailyStats, HaircutDeletionJob,
+    Reservation, business_date_for
+)
 from .serializers import (
     LicenseSerializer, BarbershopSerializer, BarberSerializer,
-    HaircutSerializer, ReservationSerializer
+    HaircutSerializer, ReservationSerializer, HaircutBulkItemSerializer,
+    ReservationBulkSerializer, HaircutRowEncoder, HaircutDeletionJobSerializer
 )
 from rest_framework_simplejwt.views import TokenObtainPairView
-from django.http import HttpResponse
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.http import HttpResponse, FileResponse
+from django.utils.dateparse import parse_date
 import io
+import logging
+import os
 import traceback
 from django.shortcuts import render
 from rest_framework.decorators import action
 from rest_framework.renderers import TemplateHTMLRenderer
-from django.db import transaction
+from django.db import transaction, IntegrityError
+from django.conf import settings
 from django.contrib.auth.models import User
+from .cache import license_cache_stats, tenant_cache_get_or_set
+from .metrics import render_prometheus
+from .profiling import disable_profiling, enable_profiling, list_profiles, profile_file
+from .authentication import license_claims
+from .exports import EXPORT_FORMATS, stream_haircuts
+from .renderers import CSVRenderer, NDJSONRenderer
+from .reports import report_pdf_path, schedule_report_pdf
+from .pagination import HaircutCursorPagination, ReservationCursorPagination
+from .stats import apply_haircut_rows
+from .sync import changes_since, log_changes, snapshot
+from .etags import tenant_etag
+from .availability import free_slots
+from .analytics import cached_haircut_analytics
+from .deletions import (
+    claim_stale_job, run_deletion_job, schedule_deletion_job, start_deletion_job
+)
+from .tenancy import TenantViewSetMixin, get_request_barbershop_id
+
+logger = logging.getLogger(__name__)
 
 
 # Vista para activar licencias
@@ -40,11 +70,7 @@ class LicenseActivationView(APIView):
                     'support_message': 'Para soporte o validar su licencia, contactar con Stephano Cornejo Córdova al 940183490'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            existing_license = License.objects.filter(
-                machine_id=machine_id,
-                is_active=True,
-                expires_at__gt=timezone.now()
-            ).first()
+            existing_license = License.objects.valid().filter(machine_id=machine_id).first()
 
             if existing_license:
                 if str(existing_license.key) == str(license_key):
@@ -93,63 +119,222 @@ class LicenseActivationView(APIView):
                 'show_support': True,
                 'support_message': 'Para soporte o validar su licencia, contactar con Stephano Cornejo Córdova al 940183490'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-# Vista para gestionar barberos
-class BarberViewSet(viewsets.ModelViewSet):
-    serializer_class = BarberSerializer
-    permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
-        return Barber.objects.filter(barbershop__owner=self.request.user)
+# Contadores de la caché de licencias (por proceso) para revisar su efectividad
+class LicenseCacheStatsView(APIView):
+    authentication_classes = [SessionAuthentication] + api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(license_cache_stats())
+
+# Métricas de todos los workers en formato Prometheus (core/metrics.py)
+class MetricsView(APIView):
+    authentication_classes = [SessionAuthentication] + api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# Perfilado a pedido (core/profiling.py): activar para un usuario y bajar los volcados
+class ProfilingView(APIView):
+    authentication_classes = [SessionAuthentication] + api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        profile_id = request.query_params.get('id')
+        if not profile_id:
+            return Response({'profiles': list_profiles()})
+
+        extension = request.query_params.get('file', 'json')
+        path = profile_file(profile_id, extension)
+        if path is None:
+            return Response({'error': 'Perfil no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(open(path, 'rb'), as_attachment=extension == 'prof',
+                            filename=os.path.basename(path))
+
+    def _user(self, request):
+        users = User.objects.all()
+        if request.data.get('user_id'):
+            return users.filter(pk=request.data['user_id']).first()
+        return users.filter(username=request.data.get('username')).first()
 
-    def perform_create(self, serializer):
+    def post(self, request):
+        user = self._user(request)
+        if user is None:
+            return Response({'error': 'Usuario no encontrado'}, status=status.HTTP_404_NOT_FOUND)
         try:
-            barbershop = Barbershop.objects.get(owner=self.request.user)
-            serializer.save(barbershop=barbershop)
-        except Barbershop.DoesNotExist:
-            raise serializers.ValidationError(
-                {"error": "No se encontró una barbería asociada a este usuario. Por favor, contacte al administrador."}
-            )
+            minutes = int(request.data.get('minutes', 15))
+        except (TypeError, ValueError):
+            minutes = 0
+        if not 0 < minutes <= 24 * 60:
+            return Response({'error': 'minutes debe estar entre 1 y 1440'}, status=status.HTTP_400_BAD_REQUEST)
+
+        enable_profiling(user.pk, minutes)
+        return Response({
+            'message': f'Perfilado activo para {user.username} durante {minutes} minutos',
+            'user_id': user.pk,
+        })
+
+    def delete(self, request):
+        user = self._user(request)
+        if user is None:
+            return Response({'error': 'Usuario no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        disable_profiling(user.pk)
+        return Response({'message': f'Perfilado desactivado para {user.username}'})
+
+# Vista para gestionar barberos
+class BarberViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
+    serializer_class = BarberSerializer
+    permission_classes = [IsAuthenticated]
+    queryset = Barber.objects.all()
 
 # Vista para gestionar cortes de cabello
-class HaircutViewSet(viewsets.ModelViewSet):
+class HaircutViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
     serializer_class = HaircutSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = HaircutCursorPagination
     queryset = Haircut.objects.all()
 
-    def get_queryset(self):
-        return Haircut.objects.filter(barbershop__owner=self.request.user)
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        # Sincronización de cortes registrados sin conexión: todo el lote se
+        # valida junto y se inserta en una transacción; los client_key ya
+        # guardados se informan como duplicados en vez de crearse otra vez.
+        items = request.data.get('haircuts') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {'error': 'Se requiere una lista de cortes en "haircuts"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > settings.HAIRCUT_BULK_MAX_ITEMS:
+            return Response(
+                {'error': f'Se permiten como máximo {settings.HAIRCUT_BULK_MAX_ITEMS} cortes por lote'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-    def perform_create(self, serializer):
-        barbershop = Barbershop.objects.get(owner=self.request.user)
-        serializer.save(barbershop=barbershop)
+        serializer = HaircutBulkItemSerializer(data=items, many=True)
+        serializer.is_valid(raise_exception=True)
+        rows = serializer.validated_data
+
+        barbershop_id = self.barbershop_id
+        barber_ids = set(
+            Barber.objects.filter(
+                barbershop_id=barbershop_id, id__in={row['barber'] for row in rows}
+            ).values_list('id', flat=True)
+        )
+        errors = [
+            {'barber': ['El barbero no pertenece a esta barbería']} if row['barber'] not in barber_ids else {}
+            for row in rows
+        ]
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # Si otro reintento del mismo lote inserta a la vez, se repite una vez
+        # y sus claves aparecen ya como existentes
+        for attempt in range(2):
+            try:
+                with transaction.atomic():
+                    created, duplicates = self._insert_bulk(barbershop_id, rows)
+                break
+            except IntegrityError:
+                if attempt:
+                    raise
+
+        return Response({
+            'created': [{'client_key': h.client_key, 'id': h.id} for h in created],
+            'duplicates': duplicates,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    def _insert_bulk(self, barbershop_id, rows):
+        keys = [row['client_key'] for row in rows]
+        seen = set(
+            Haircut.objects.filter(barbershop_id=barbershop_id, client_key__in=keys)
+            .values_list('client_key', flat=True)
+        )
+
+        now = timezone.now()
+        haircuts, duplicates = [], []
+        for row in rows:
+            if row['client_key'] in seen:
+                duplicates.append(row['client_key'])
+                continue
+            seen.add(row['client_key'])
+            haircuts.append(Haircut(
+                barbershop_id=barbershop_id,
+                barber_id=row['barber'],
+                client_name=row.get('client_name'),
+                payment_method=row['payment_method'],
+                amount=row['amount'],
+                client_key=row['client_key'],
+                business_date=business_date_for(now),
+            ))
+
+        created = Haircut.objects.bulk_create(haircuts, batch_size=500)
+        apply_haircut_rows(created)
+        log_changes(barbershop_id, 'haircut', [haircut.id for haircut in created], 'upsert')
+        return created, duplicates
+
+    def get_queryset(self):
+        # barber_name se lee del barbero: sin esto, una consulta por corte
+        return super().get_queryset().select_related('barber')
+
+    @tenant_etag()
+    def list(self, request, *args, **kwargs):
+        # Listado rápido: una sola consulta con las columnas justas, sin
+        # importar cuántos cortes haya, y sin el serializer completo por fila
+        queryset = self.filter_queryset(self.get_queryset()).values(*HaircutRowEncoder.columns)
+        encoder = HaircutRowEncoder()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(encoder.encode_many(page))
+        return Response(encoder.encode_many(queryset))
 
     @action(detail=False, methods=['get'])
+    @tenant_etag(extra=lambda request: timezone.localdate())
     def balance(self, request):
-        today = timezone.now().date()
+        # Día de la barbería, el mismo con el que se agrupan los acumulados
+        today = timezone.localdate()
         period = request.query_params.get('period', 'daily')
-        
-        if period == 'daily':
-            haircuts = self.get_queryset().filter(created_at__date=today)
-        else:  # monthly
-            month_start = today.replace(day=1)
-            haircuts = self.get_queryset().filter(
-                created_at__date__gte=month_start,
-                created_at__date__lte=today
+
+        def compute_totals():
+            stats = HaircutDailyStats.objects.filter(barbershop_id=self.barbershop_id)
+            if period == 'daily':
+                stats = stats.filter(date=today)
+            else:  # monthly
+                stats = stats.filter(date__gte=today.replace(day=1), date__lte=today)
+
+            totals = stats.aggregate(
+                totalIncome=Sum('total_amount'),
+                totalCuts=Sum('cut_count'),
+                cashTotal=Sum('total_amount', filter=Q(payment_method='CASH')),
+                yapeTotal=Sum('total_amount', filter=Q(payment_method='YAPE')),
             )
+            return {key: value or 0 for key, value in totals.items()}
 
-        totals = {
-            'totalIncome': sum(h.amount for h in haircuts),
-            'totalCuts': haircuts.count(),
-            'cashTotal': sum(h.amount for h in haircuts if h.payment_method == 'CASH'),
-            'yapeTotal': sum(h.amount for h in haircuts if h.payment_method == 'YAPE')
-        }
+        # Compartido entre workers; se invalida con cada escritura de cortes
+        totals = tenant_cache_get_or_set(self.barbershop_id, ('balance', period, today), compute_totals)
 
         return Response({
             f'{period}Stats': totals
         })
 
     @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        start_date = parse_date(request.query_params.get('startDate') or '')
+        end_date = parse_date(request.query_params.get('endDate') or '')
+        if not start_date or not end_date or end_date < start_date:
+            return Response(
+                {'error': 'Se requieren startDate y endDate con formato YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(cached_haircut_analytics(self.barbershop_id, start_date, end_date))
+
+    @action(
+        detail=False,
+        methods=['get'],
+        renderer_classes=api_settings.DEFAULT_RENDERER_CLASSES + [CSVRenderer, NDJSONRenderer],
+    )
     def report(self, request):
         print("Recibiendo solicitud de reporte")
         print(f"Usuario autenticado: {request.user}")
@@ -169,10 +354,14 @@ class HaircutViewSet(viewsets.ModelViewSet):
             print(f"Fechas: {start_date} - {end_date}")
             
             haircuts = self.get_queryset().filter(
-                barbershop__owner=request.user,
-                created_at__date__range=[start_date, end_date]
+                business_date__range=[start_date, end_date]
             ).order_by('created_at')
-            
+
+            # ?format=csv / ?format=ndjson: exportación en streaming
+            export_format = request.accepted_renderer.format
+            if export_format in EXPORT_FORMATS:
+                return stream_haircuts(haircuts, export_format, f'cortes_{start_date}_{end_date}')
+
             print(f"Cortes encontrados: {haircuts.count()}")
 
             total = haircuts.aggregate(
@@ -200,25 +389,58 @@ class HaircutViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=False, methods=['get'])
+    def report_pdf(self, request):
+        start_date = parse_date(request.query_params.get('startDate') or '')
+        end_date = parse_date(request.query_params.get('endDate') or '')
+        if not start_date or not end_date:
+            return Response(
+                {'error': 'Se requieren startDate y endDate con formato YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Si el PDF de esta versión de los datos ya existe, es solo leer un archivo
+        path = report_pdf_path(self.barbershop_id, start_date, end_date)
+        if path.exists():
+            return FileResponse(open(path, 'rb'), content_type='application/pdf', filename=path.name)
+
+        schedule_report_pdf(self.barbershop_id, start_date, end_date, path)
+        return Response(
+            {'status': 'pending', 'message': 'El reporte se está generando, vuelva a consultar en unos segundos'},
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Retry-After': '2'}
+        )
+
     @action(detail=False, methods=['delete'])
     def delete_all(self, request):
+        # Se elimina por lotes en un trabajo en segundo plano; el avance se
+        # consulta en delete_all/status. ?archive=1 guarda antes un CSV comprimido.
         try:
-            # Obtener todos los cortes de la barbería actual
-            haircuts = self.get_queryset()
-            deleted_count = haircuts.count()
-            
-            if deleted_count == 0:
+            archive = request.query_params.get('archive') in ('1', 'true', 'True')
+            job, created = start_deletion_job(self.barbershop_id, archive=archive)
+            if job is None:
                 return Response({
                     'message': 'No hay registros para eliminar'
                 }, status=status.HTTP_200_OK)
 
-            # Eliminar los registros
-            haircuts.delete()
+            # Un solo lote sin archivo: se resuelve en la request como antes
+            if created and not archive and job.total <= settings.HAIRCUT_DELETE_BATCH_SIZE:
+                job = run_deletion_job(job.id)
+            elif created:
+                schedule_deletion_job(job.id)
+                job.refresh_from_db()
+
+            if job.status == 'done':
+                return Response({
+                    'message': f'Se eliminaron {job.deleted} registros correctamente',
+                    'deleted_count': job.deleted,
+                    'job': HaircutDeletionJobSerializer(job).data,
+                }, status=status.HTTP_200_OK)
 
             return Response({
-                'message': f'Se eliminaron {deleted_count} registros correctamente',
-                'deleted_count': deleted_count
-            }, status=status.HTTP_200_OK)
+                'message': 'La eliminación se está procesando',
+                'job': HaircutDeletionJobSerializer(job).data,
+            }, status=status.HTTP_202_ACCEPTED, headers={'Retry-After': '2'})
 
         except Exception as e:
             print(f"Error al eliminar registros: {str(e)}")
@@ -226,29 +448,171 @@ class HaircutViewSet(viewsets.ModelViewSet):
                 {'error': 'Error al eliminar los registros'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+    def _deletion_job(self, request):
+        jobs = HaircutDeletionJob.objects.filter(barbershop_id=self.barbershop_id)
+        job_id = request.query_params.get('job')
+        if job_id:
+            return jobs.filter(id=job_id).first() if job_id.isdigit() else None
+        return jobs.order_by('-id').first()
+
+    @action(detail=False, methods=['get'], url_path='delete_all/status')
+    def delete_all_status(self, request):
+        # ?job=<id>; sin él, el último trabajo de la barbería
+        job = self._deletion_job(request)
+        if job is None:
+            return Response({'error': 'No se encontró el trabajo de eliminación'},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        # Si el worker que lo ejecutaba se reinició, se retoma desde aquí
+        if claim_stale_job(job):
+            logger.info('Retomando eliminación %s (%s/%s)', job.id, job.deleted, job.total)
+            schedule_deletion_job(job.id)
+        return Response(HaircutDeletionJobSerializer(job).data)
+
+    @action(detail=False, methods=['get'], url_path='delete_all/archive')
+    def delete_all_archive(self, request):
+        job = self._deletion_job(request)
+        if job is None or not job.archive_path:
+            return Response({'error': 'No hay un archivo disponible para este trabajo'},
+                            status=status.HTTP_404_NOT_FOUND)
+        try:
+            archive = open(job.archive_path, 'rb')
+        except FileNotFoundError:
+            # Se registró el archivo pero ya no está en disco (borrado o en otro servidor)
+            return Response({'error': 'El archivo de este trabajo ya no está disponible'},
+                            status=status.HTTP_410_GONE)
+        return FileResponse(archive, content_type='application/gzip',
+                            as_attachment=True, filename=os.path.basename(job.archive_path))
         
 # Vista para gestionar reservas
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
     serializer_class = ReservationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ReservationCursorPagination
     queryset = Reservation.objects.all()
 
     def get_queryset(self):
-        return Reservation.objects.filter(
-            barbershop__owner=self.request.user,
-            is_active=True
-        ).order_by('date', 'time')
+        return super().get_queryset().filter(is_active=True).order_by('date', 'time')
+
+    @tenant_etag()
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        start_date = parse_date(request.query_params.get('startDate') or '')
+        end_date = parse_date(request.query_params.get('endDate') or '')
+        if not start_date or not end_date or end_date < start_date:
+            return Response(
+                {'error': 'Se requieren startDate y endDate con formato YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if (end_date - start_date).days >= settings.AVAILABILITY_MAX_DAYS:
+            return Response(
+                {'error': f'El rango no puede superar {settings.AVAILABILITY_MAX_DAYS} días'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        barbershop = self.barbershop
+        return Response({
+            'opening_time': barbershop.opening_time.strftime('%H:%M'),
+            'closing_time': barbershop.closing_time.strftime('%H:%M'),
+            'days': free_slots(barbershop, start_date, end_date),
+        })
+
+    @staticmethod
+    def book(serializer, **kwargs):
+        # El INSERT (o UPDATE) es el que reserva el turno: si otra request lo
+        # tomó antes, el índice único parcial lo rechaza y solo se deshace
+        # este savepoint
+        with transaction.atomic():
+            return serializer.save(**kwargs)
 
     def perform_create(self, serializer):
         try:
-            barbershop = Barbershop.objects.get(owner=self.request.user)
-            serializer.save(barbershop=barbershop)
-        except Barbershop.DoesNotExist:
+            self.book(serializer, barbershop_id=self.barbershop_id)
+        except IntegrityError:
             raise serializers.ValidationError(
-                {"error": "No se encontró una barbería asociada a este usuario"}
+                {"time": "Ya existe una reserva para esta fecha y hora"}
             )
 
-    
+    def perform_update(self, serializer):
+        try:
+            self.book(serializer)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {"time": "Ya existe una reserva para esta fecha y hora"}
+            )
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        bulk = ReservationBulkSerializer(data=request.data)
+        bulk.is_valid(raise_exception=True)
+        if bulk.slot_count() > settings.RESERVATION_BULK_MAX_SLOTS:
+            return Response(
+                {'error': f'Se permiten como máximo {settings.RESERVATION_BULK_MAX_SLOTS} turnos por solicitud'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        slots = bulk.expand_slots()
+
+        barbershop_id = self.barbershop_id
+        context = self.get_serializer_context()
+        results = []
+        with transaction.atomic():
+            for slot in slots:
+                result = {'date': slot.get('date'), 'time': slot.get('time')}
+                serializer = ReservationSerializer(data=slot, context=context)
+                if not serializer.is_valid():
+                    result.update(status='invalid', errors=serializer.errors)
+                else:
+                    try:
+                        reservation = self.book(serializer, barbershop_id=barbershop_id)
+                        result.update(status='created', id=reservation.id)
+                    except IntegrityError:
+                        result.update(status='conflict')
+                results.append(result)
+
+            failed = any(result['status'] != 'created' for result in results)
+            if failed and bulk.validated_data['all_or_nothing']:
+                transaction.set_rollback(True)
+                for result in results:
+                    if result['status'] == 'created':
+                        result['status'] = 'rolled_back'
+                        del result['id']
+
+        created = sum(result['status'] == 'created' for result in results)
+        if created:
+            response_status = status.HTTP_201_CREATED
+        elif any(result['status'] == 'conflict' for result in results):
+            response_status = status.HTTP_409_CONFLICT
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({'created': created, 'results': results}, status=response_status)
+
+
+# Sincronización incremental: ?since=<cursor> devuelve solo lo que cambió;
+# sin cursor devuelve el estado completo y el cursor inicial
+class ChangesView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        barbershop_id = get_request_barbershop_id(request)
+        context = {'request': request}
+        since = request.query_params.get('since')
+        if not since:
+            return Response(snapshot(barbershop_id, context))
+
+        try:
+            since = int(since)
+        except ValueError:
+            return Response(
+                {'error': 'El cursor "since" debe ser un número'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(changes_since(barbershop_id, since, context))
+
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     def post(self, request, *args, **kwargs):
         try:
@@ -266,11 +630,7 @@ class CustomTokenObtainPairView(TokenObtainPairView):
             if response.status_code == 200:
                 user = User.objects.get(username=request.data.get('username'))
                 
-                license = License.objects.filter(
-                    machine_id=machine_id,
-                    is_active=True,
-                    expires_at__gt=timezone.now()
-                ).first()
+                license = License.objects.valid().filter(machine_id=machine_id).first()
 
                 if not license:
                     return Response({
@@ -285,12 +645,19 @@ class CustomTokenObtainPairView(TokenObtainPairView):
                         barbershop.license = license
                         barbershop.save()
                     else:
-                        Barbershop.objects.create(
+                        barbershop = Barbershop.objects.create(
                             name=f'Barbería de {user.username}',
                             owner=user,
                             license=license
                         )
 
+                # Firmar la barbería y la licencia en los tokens para que
+                # LicenseMiddleware pueda autorizar sin consultar la base de datos
+                refresh = RefreshToken(response.data['refresh'])
+                refresh['lic'] = license_claims(user, barbershop, license)
+                response.data['refresh'] = str(refresh)
+                response.data['access'] = str(refresh.access_token)
+
                 return response
 
         except User.DoesNotExist:
@@ -0,0 +1,24 @@
+# gunicorn.conf.py
+# WEB_WORKER_CLASS=sync (por defecto): la app WSGI de siempre, una request por
+# hilo. WEB_WORKER_CLASS=uvicorn: la app ASGI con workers de uvicorn, donde
+# cada proceso atiende muchas consultas a la vez (las vistas de /api/async/ no
+# ocupan un hilo mientras esperan a la base de datos).
+import os
+
+worker_mode = os.getenv('WEB_WORKER_CLASS', 'sync')
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+timeout = int(os.getenv('WEB_TIMEOUT', '30'))
+graceful_timeout = timeout
+errorlog = '-'
+
+if worker_mode == 'uvicorn':
+    wsgi_app = 'barbershop.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    # Bajo ASGI el ORM corre en hilos que no cierran su conexión al terminar
+    # cada request: sin conexiones persistentes no se acumulan abiertas
+    os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+else:
+    wsgi_app = 'barbershop.wsgi:application'
+    worker_class = 'sync'